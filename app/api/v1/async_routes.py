@@ -0,0 +1,264 @@
+"""
+Async variants of the todo routes, served when DATABASE_ASYNC is enabled.
+
+Handlers here override the sync handlers of app.api.v1.routes with the same
+path and method; routes without an async variant keep the sync handler.
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Response, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import etag as etags
+from app.db.database import AsyncReadSessionLocal, AsyncSessionLocal
+from app.models.todo import TodoStatusEnum
+from app.repositories import todo_repository
+from app.services import cache_service, group_commit, todo_service
+from app.services.todo_service import PreconditionFailed
+from app.schemas.todo import TodoCreate, TodoListResponse, TodoResponse, TodoStatsResponse, TodoUpdate
+from typing import Optional
+
+
+router = APIRouter(tags=["Todos"])
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+def override_routes(base: APIRouter, overrides: APIRouter) -> APIRouter:
+    """
+    Build a router with the routes of base, replacing those overridden
+    
+    The order of base is kept so literal paths such as /todos/stats still
+    match before /todos/{todo_id}.
+    
+    Args:
+        base: Router providing the routes and their order
+        overrides: Router whose routes replace those with the same path and methods
+        
+    Returns:
+        New router
+    """
+    replacements = {(route.path, frozenset(route.methods)): route for route in overrides.routes}
+    merged = APIRouter(tags=base.tags)
+    for route in base.routes:
+        merged.routes.append(replacements.get((route.path, frozenset(getattr(route, "methods", ()))), route))
+    return merged
+
+
+@router.post("/todos", response_model=TodoResponse, status_code=status.HTTP_201_CREATED)
+async def create_todo(todo: TodoCreate, response: Response, request: Request, db: AsyncSession = Depends(get_db)):
+    if group_commit.async_batcher is not None:
+        created = await group_commit.async_batcher.create(todo)
+    else:
+        created = await todo_repository.create_todo(db, todo)
+    response.headers["Location"] = f"{request.url.path}/{created.id}"
+    return created
+
+
+@router.get("/todos", response_model=Optional[TodoListResponse])
+async def list_todos(
+    limit: int = Query(20, ge=1, description="Maximum number of items to return"),
+    offset: int = Query(0, ge=0, description="Number of items to skip"),
+    cursor: Optional[str] = Query(
+        None,
+        description="Opaque cursor from a previous page's nextCursor (takes precedence over offset)"
+    ),
+    status_filter: Optional[str] = Query(
+        None,
+        alias="status",
+        description="Filter todos by status (new, in-progress, completed)"
+    ),
+    q: Optional[str] = Query(
+        None,
+        min_length=1,
+        description="Full-text search over title and description"
+    ),
+    sortBy: Optional[str] = Query(
+        None,
+        regex="^(createdAt|updatedAt|relevance)$",
+        description="Field to sort by (default: relevance when searching, createdAt otherwise)"
+    ),
+    order: str = Query(
+        "desc",
+        regex="^(asc|desc)$",
+        description="Sort order (ascending or descending)"
+    ),
+    if_none_match: Optional[str] = Header(
+        None,
+        description="ETag of a previous response, answered with 304 while the page is unchanged"
+    ),
+    db: AsyncSession = Depends(get_read_db)
+):
+    sort_by = sortBy or todo_service.default_sort(q)
+    etag = await cache_service.list_etag_async(
+        db, limit, offset, status_filter, sort_by, order, cursor, q
+    )
+    if etags.none_match(if_none_match, etag):
+        return etags.not_modified(etag)
+
+    try:
+        body = await cache_service.get_todos_async(
+            db, limit, offset, status_filter, sort_by, order, cursor, q, etag
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    if body is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT, media_type="application/json")
+
+    # The body is already encoded in the shape of TodoListResponse
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get("/todos/stats", response_model=TodoStatsResponse)
+async def todo_stats(db: AsyncSession = Depends(get_read_db)):
+    counts = await todo_repository.get_counts(db)
+    return {
+        "total": sum(counts.values()),
+        "byStatus": {status.value: count for status, count in counts.items()},
+    }
+
+
+@router.get("/todos/{todo_id}", response_model=TodoResponse)
+async def get_todo(
+    todo_id: int,
+    if_none_match: Optional[str] = Header(
+        None,
+        description="ETag of a previous response, answered with 304 while the todo is unchanged"
+    ),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if if_none_match:
+        # Only updated_at is read to answer polls of an unchanged todo
+        exists, updated_at = await todo_repository.get_todo_updated_at(db, todo_id)
+        if not exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Todo not found"
+            )
+        etag = etags.todo_etag(todo_id, updated_at)
+        if etags.none_match(if_none_match, etag):
+            return etags.not_modified(etag)
+
+    found = await cache_service.get_todo_async(db, todo_id)
+    if found is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Todo not found"
+        )
+    body, etag = found
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.put("/todos/{todo_id}", response_model=TodoResponse)
+async def update_todo(
+    todo_id: int,
+    update_data: TodoUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(
+        None,
+        description="ETag the todo must still have, answered with 412 otherwise"
+    ),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        updated = await todo_repository.update_todo(db, todo_id, update_data, etags.expected_versions(if_match, todo_id))
+    except PreconditionFailed as e:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=str(e)
+        )
+    if not updated:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Todo not found"
+        )
+    response.headers["ETag"] = etags.todo_etag(updated.id, updated.updated_at)
+    return updated
+
+
+@router.patch("/todos/{todo_id}", response_model=TodoResponse)
+async def patch_todo(
+    todo_id: int,
+    update_data: TodoUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(
+        None,
+        description="ETag the todo must still have, answered with 412 otherwise"
+    ),
+    db: AsyncSession = Depends(get_db)
+):
+    if not update_data.model_dump(exclude_unset=True):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No fields provided for update"
+        )
+
+    try:
+        updated = await todo_repository.update_todo(db, todo_id, update_data, etags.expected_versions(if_match, todo_id))
+    except PreconditionFailed as e:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=str(e)
+        )
+    if not updated:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Todo not found"
+        )
+    response.headers["ETag"] = etags.todo_etag(updated.id, updated.updated_at)
+    return updated
+
+
+@router.delete("/todos/{todo_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_todo(
+    todo_id: int,
+    if_match: Optional[str] = Header(
+        None,
+        description="ETag the todo must still have, answered with 412 otherwise"
+    ),
+    db: AsyncSession = Depends(get_db)
+):
+    try:
+        success = await todo_repository.delete_todo(db, todo_id, etags.expected_versions(if_match, todo_id))
+    except PreconditionFailed as e:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=str(e)
+        )
+    if not success:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Todo not found"
+        )
+    return None
+
+
+@router.post("/todos/{todo_id}/complete", response_model=TodoResponse)
+async def complete_todo(todo_id: int, db: AsyncSession = Depends(get_db)):
+    updated_todo = await todo_repository.update_status(db, todo_id, TodoStatusEnum.completed)
+    if not updated_todo:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Todo not found"
+        )
+    return updated_todo
+
+
+@router.post("/todos/{todo_id}/in-progress", response_model=TodoResponse)
+async def mark_in_progress(todo_id: int, db: AsyncSession = Depends(get_db)):
+    updated_todo = await todo_repository.update_status(db, todo_id, TodoStatusEnum.in_progress)
+    if not updated_todo:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Todo not found"
+        )
+    return updated_todo
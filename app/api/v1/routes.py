@@ -1,9 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Request
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query, Response, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from app.db.database import SessionLocal
-from app.schemas.todo import TodoCreate, TodoListResponse, TodoResponse, TodoUpdate
-from app.services import todo_service
+from app.core import changes, etag as etags
+from app.core.cache import cache
+from app.core.config import settings
+from app.db.database import ReadSessionLocal, SessionLocal
+from app.schemas.todo import (
+    CacheStatsResponse,
+    TodoBatchCreate,
+    TodoBatchDelete,
+    TodoBatchResponse,
+    TodoBatchStatusUpdate,
+    TodoCreate,
+    TodoImportResponse,
+    TodoListResponse,
+    TodoResponse,
+    TodoStatsResponse,
+    TodoUpdate,
+)
+from app.services import cache_service, counter_service, export_service, group_commit, import_service, todo_service
+from app.services.todo_service import PreconditionFailed
 from typing import Optional
+import anyio
 
 
 router = APIRouter(tags=["Todos"])
@@ -17,87 +36,395 @@ def get_db():
         db.close()
 
 
+def get_read_db():
+    # Read-only routes use the replica, which is the primary when none is set
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def check_batch_size(size: int):
+    if not size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Batch is empty"
+        )
+    if size > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {settings.BATCH_MAX_ITEMS} items"
+        )
+
+
 @router.post("/todos", response_model=TodoResponse, status_code=status.HTTP_201_CREATED)
 def create_todo(todo: TodoCreate, response: Response, request: Request, db: Session = Depends(get_db)):
-    created = todo_service.create_todo(db, todo)
+    if group_commit.batcher is not None:
+        created = group_commit.batcher.create(db, todo)
+    else:
+        created = todo_service.create_todo(db, todo)
     # Set Location header as per specification
     response.headers["Location"] = f"{request.url.path}/{created.id}"
     return created
 
 
+@router.post("/todos:batch", response_model=TodoBatchResponse)
+def create_todos(batch: TodoBatchCreate, db: Session = Depends(get_db)):
+    check_batch_size(len(batch.items))
+    rows = todo_service.create_todos(db, batch.items)
+    return {"results": [
+        {"index": index, "id": row.id, "code": status.HTTP_201_CREATED, "data": row}
+        for index, row in enumerate(rows)
+    ]}
+
+
+@router.patch("/todos:batch-status", response_model=TodoBatchResponse)
+def update_todos_status(batch: TodoBatchStatusUpdate, db: Session = Depends(get_db)):
+    from app.models.todo import TodoStatusEnum
+    
+    check_batch_size(len(batch.ids))
+    updated = todo_service.update_status_many(db, batch.ids, TodoStatusEnum(batch.status.value))
+    return {"results": [
+        {"index": index, "id": todo_id, "code": status.HTTP_200_OK, "data": updated[todo_id]}
+        if todo_id in updated else
+        {"index": index, "id": todo_id, "code": status.HTTP_404_NOT_FOUND, "error": "Todo not found"}
+        for index, todo_id in enumerate(batch.ids)
+    ]}
+
+
+@router.delete("/todos:batch", response_model=TodoBatchResponse)
+def delete_todos(batch: TodoBatchDelete, db: Session = Depends(get_db)):
+    check_batch_size(len(batch.ids))
+    deleted = set(todo_service.delete_todos(db, batch.ids))
+    results = []
+    for index, todo_id in enumerate(batch.ids):
+        if todo_id in deleted:
+            # Repeated ids are only reported as deleted once
+            deleted.discard(todo_id)
+            results.append({"index": index, "id": todo_id, "code": status.HTTP_204_NO_CONTENT})
+        else:
+            results.append({
+                "index": index, "id": todo_id,
+                "code": status.HTTP_404_NOT_FOUND, "error": "Todo not found"
+            })
+    return {"results": results}
+
+
 @router.get("/todos", response_model=Optional[TodoListResponse])
 def list_todos(
-    response: Response,
     limit: int = Query(20, ge=1, description="Maximum number of items to return"),
     offset: int = Query(0, ge=0, description="Number of items to skip"),
+    cursor: Optional[str] = Query(
+        None,
+        description="Opaque cursor from a previous page's nextCursor (takes precedence over offset)"
+    ),
     status_filter: Optional[str] = Query(
         None, 
         alias="status",
         description="Filter todos by status (new, in-progress, completed)"
     ),
+    q: Optional[str] = Query(
+        None,
+        min_length=1,
+        description="Full-text search over title and description"
+    ),
+    sortBy: Optional[str] = Query(
+        None,
+        regex="^(createdAt|updatedAt|relevance)$",
+        description="Field to sort by (default: relevance when searching, createdAt otherwise)"
+    ),
+    order: str = Query(
+        "desc", 
+        regex="^(asc|desc)$",
+        description="Sort order (ascending or descending)"
+    ),
+    if_none_match: Optional[str] = Header(
+        None,
+        description="ETag of a previous response, answered with 304 while the page is unchanged"
+    ),
+    db: Session = Depends(get_read_db)
+):
+    sort_by = sortBy or todo_service.default_sort(q)
+    etag = cache_service.list_etag(
+        db, limit, offset, status_filter, sort_by, order, cursor, q
+    )
+    if etags.none_match(if_none_match, etag):
+        return etags.not_modified(etag)
+
+    try:
+        body = cache_service.get_todos(
+            db, limit, offset, status_filter, sort_by, order, cursor, q, etag
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if body is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT, media_type="application/json")
+    
+    # The body is already encoded in the shape of TodoListResponse
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get("/todos/stats", response_model=TodoStatsResponse)
+def todo_stats(db: Session = Depends(get_read_db)):
+    counts = counter_service.get_counts(db)
+    return {
+        "total": sum(counts.values()),
+        "byStatus": {status.value: count for status, count in counts.items()},
+    }
+
+
+@router.get(
+    "/todos/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {media_type: {} for media_type in export_service.MEDIA_TYPES.values()}}},
+)
+def export_todos(
+    format: str = Query(
+        "ndjson",
+        regex="^(ndjson|csv)$",
+        description="Export format (ndjson or csv)"
+    ),
+    status_filter: Optional[str] = Query(
+        None,
+        alias="status",
+        description="Filter todos by status (new, in-progress, completed)"
+    ),
     sortBy: str = Query(
-        "createdAt", 
+        "createdAt",
         regex="^(createdAt|updatedAt)$",
         description="Field to sort by"
     ),
     order: str = Query(
-        "desc", 
+        "desc",
         regex="^(asc|desc)$",
         description="Sort order (ascending or descending)"
     ),
-    db: Session = Depends(get_db)
 ):
-    total, todos = todo_service.get_todos(db, limit, offset, status_filter, sortBy, order)
+    return StreamingResponse(
+        export_service.stream_todos(ReadSessionLocal, format, status_filter, sortBy, order),
+        media_type=export_service.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="todos.{format}"'},
+    )
+
+
+@router.post(
+    "/todos/import",
+    response_model=TodoImportResponse,
+    openapi_extra={"requestBody": {"content": {
+        media_type: {"schema": {"type": "string"}} for media_type in import_service.MEDIA_TYPES.values()
+    }}},
+)
+async def import_todos(
+    request: Request,
+    format: Optional[str] = Query(
+        None,
+        regex="^(ndjson|csv)$",
+        description="Body format (ndjson or csv), guessed from Content-Type when omitted"
+    ),
+):
+    if not format:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if content_type.startswith(import_service.MEDIA_TYPES["csv"]) else "ndjson"
+    stream = request.stream()
     
-    if not todos:
-        response.status_code = status.HTTP_204_NO_CONTENT
-        return None
-        
-    return {"total": total, "limit": limit, "offset": offset, "data": todos}
+    def body():
+        # Pull the body from the event loop one chunk at a time
+        while True:
+            try:
+                chunk = anyio.from_thread.run(stream.__anext__)
+            except StopAsyncIteration:
+                return
+            if chunk:
+                yield chunk
+    
+    try:
+        return await run_in_threadpool(import_service.import_todos, SessionLocal, format, body())
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body is not valid UTF-8"
+        )
+
+
+@router.get("/cache/stats", response_model=CacheStatsResponse)
+def get_cache_stats():
+    return {"backend": cache.name, **cache.snapshot()}
+
+
+@router.get(
+    "/todos/changes",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def stream_changes(
+    since: Optional[int] = Query(
+        None,
+        ge=0,
+        description="Sequence number of the last event received, to resume after it"
+    ),
+    last_event_id: Optional[int] = Header(
+        None,
+        ge=0,
+        description="Sent by EventSource when it reconnects; takes precedence over since"
+    ),
+):
+    return StreamingResponse(
+        changes.sse_events(last_event_id if last_event_id is not None else since, settings.CHANGES_PING_INTERVAL),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/todos/changes")
+async def watch_changes(
+    websocket: WebSocket,
+    since: Optional[int] = Query(
+        None,
+        ge=0,
+        description="Sequence number of the last event received, to resume after it"
+    ),
+):
+    await websocket.accept()
+    subscription, missed = changes.feed.subscribe(since)
+
+    async def send_events(cancel_scope):
+        try:
+            if missed:
+                await websocket.send_text(changes.RELOAD_EVENT)
+            while True:
+                event = await subscription.get()
+                await websocket.send_text(event.data)
+        except changes.Lagged:
+            # The client reconnects with the last sequence number it received
+            await websocket.send_text(changes.LAGGED_EVENT)
+            await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        except WebSocketDisconnect:
+            pass
+        cancel_scope.cancel()
+
+    try:
+        async with anyio.create_task_group() as tasks:
+            tasks.start_soon(send_events, tasks.cancel_scope)
+            # Messages from the client are ignored, receiving notices it leaving
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+            tasks.cancel_scope.cancel()
+    finally:
+        subscription.close()
 
 
 @router.get("/todos/{todo_id}", response_model=TodoResponse)
-def get_todo(todo_id: int, db: Session = Depends(get_db)):
-    todo = todo_service.get_todo(db, todo_id)
-    if not todo:
+def get_todo(
+    todo_id: int,
+    if_none_match: Optional[str] = Header(
+        None,
+        description="ETag of a previous response, answered with 304 while the todo is unchanged"
+    ),
+    db: Session = Depends(get_read_db)
+):
+    if if_none_match:
+        # Only updated_at is read to answer polls of an unchanged todo
+        exists, updated_at = todo_service.get_todo_updated_at(db, todo_id)
+        if not exists:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, 
+                detail="Todo not found"
+            )
+        etag = etags.todo_etag(todo_id, updated_at)
+        if etags.none_match(if_none_match, etag):
+            return etags.not_modified(etag)
+
+    found = cache_service.get_todo(db, todo_id)
+    if found is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="Todo not found"
         )
-    return todo
+    body, etag = found
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @router.put("/todos/{todo_id}", response_model=TodoResponse)
-def update_todo(todo_id: int, update_data: TodoUpdate, db: Session = Depends(get_db)):
-    updated = todo_service.update_todo(db, todo_id, update_data)
+def update_todo(
+    todo_id: int,
+    update_data: TodoUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(
+        None,
+        description="ETag the todo must still have, answered with 412 otherwise"
+    ),
+    db: Session = Depends(get_db)
+):
+    try:
+        updated = todo_service.update_todo(db, todo_id, update_data, etags.expected_versions(if_match, todo_id))
+    except PreconditionFailed as e:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=str(e)
+        )
     if not updated:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="Todo not found"
         )
+    response.headers["ETag"] = etags.todo_etag(updated.id, updated.updated_at)
     return updated
 
 
 @router.patch("/todos/{todo_id}", response_model=TodoResponse)
-def patch_todo(todo_id: int, update_data: TodoUpdate, db: Session = Depends(get_db)):
+def patch_todo(
+    todo_id: int,
+    update_data: TodoUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(
+        None,
+        description="ETag the todo must still have, answered with 412 otherwise"
+    ),
+    db: Session = Depends(get_db)
+):
     if not update_data.model_dump(exclude_unset=True):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No fields provided for update"
         )
         
-    updated = todo_service.update_todo(db, todo_id, update_data)
+    try:
+        updated = todo_service.update_todo(db, todo_id, update_data, etags.expected_versions(if_match, todo_id))
+    except PreconditionFailed as e:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=str(e)
+        )
     if not updated:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="Todo not found"
         )
+    response.headers["ETag"] = etags.todo_etag(updated.id, updated.updated_at)
     return updated
 
 
 @router.delete("/todos/{todo_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_todo(todo_id: int, db: Session = Depends(get_db)):
-    success = todo_service.delete_todo(db, todo_id)
+def delete_todo(
+    todo_id: int,
+    if_match: Optional[str] = Header(
+        None,
+        description="ETag the todo must still have, answered with 412 otherwise"
+    ),
+    db: Session = Depends(get_db)
+):
+    try:
+        success = todo_service.delete_todo(db, todo_id, etags.expected_versions(if_match, todo_id))
+    except PreconditionFailed as e:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=str(e)
+        )
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
@@ -111,15 +438,12 @@ def delete_todo(todo_id: int, db: Session = Depends(get_db)):
 def complete_todo(todo_id: int, db: Session = Depends(get_db)):
     from app.models.todo import TodoStatusEnum
     
-    todo = todo_service.get_todo(db, todo_id)
-    if not todo:
+    updated_todo = todo_service.update_status(db, todo_id, TodoStatusEnum.completed)
+    if not updated_todo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="Todo not found"
         )
-    
-    # Use the update_status function
-    updated_todo = todo_service.update_status(db, todo_id, TodoStatusEnum.completed)
     return updated_todo
 
 
@@ -127,13 +451,10 @@ def complete_todo(todo_id: int, db: Session = Depends(get_db)):
 def mark_in_progress(todo_id: int, db: Session = Depends(get_db)):
     from app.models.todo import TodoStatusEnum
     
-    todo = todo_service.get_todo(db, todo_id)
-    if not todo:
+    updated_todo = todo_service.update_status(db, todo_id, TodoStatusEnum.in_progress)
+    if not updated_todo:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="Todo not found"
         )
-    
-    # Use the update_status function
-    updated_todo = todo_service.update_status(db, todo_id, TodoStatusEnum.in_progress)
     return updated_todo
\ No newline at end of file
@@ -0,0 +1,454 @@
+"""
+Key/value cache for todo reads.
+
+Values are JSON strings. List pages are stored under keys that embed a
+version per status; a mutation bumps the versions of the statuses it touches,
+which makes every affected page unreachable without scanning keys.
+
+Single todos are stored under their id. Invalidating one deletes its entry
+and stamps it with a new number; a reader stores the todo it selected only if
+the stamp it read before the database is still current, so a read racing a
+mutation cannot put the old todo back.
+
+Every backend offers async variants of its methods for the async handlers.
+The Redis backend fails open: while Redis cannot be reached, reads miss and
+writes are skipped.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Namespace holding the version of unfiltered list pages
+ALL_STATUSES = "all"
+
+# Stamps outlive the entries they guard, so that only a read slower than
+# this many TTLs could store a todo invalidated while it ran
+STAMP_TTL_FACTOR = 2
+
+
+class CacheStats:
+    """Hit, miss and eviction counters of a cache backend"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def evicted(self, count: int = 1):
+        with self._lock:
+            self.evictions += count
+
+    def as_dict(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class NullCache:
+    """Backend used when caching is disabled"""
+
+    name = "none"
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Optional[str]:
+        return None
+
+    def set(self, key: str, value: str):
+        pass
+
+    def get_stamped(self, key: str) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Get an entry along with its invalidation stamp
+        
+        Returns:
+            Tuple of (value or None, stamp to pass to set_unless_invalidated,
+            None when the value must not be stored)
+        """
+        return None, None
+
+    def set_unless_invalidated(self, key: str, value: str, stamp: Optional[int]):
+        """Store an entry unless it was invalidated since its stamp was read"""
+        pass
+
+    def get_versions(self, names: Iterable[str]) -> Optional[Dict[str, int]]:
+        """Current versions of the names, None when they cannot be read"""
+        return {name: 0 for name in names}
+
+    def invalidate(self, keys: Iterable[str], versions: Iterable[str]):
+        pass
+
+    # Async variants, for backends whose calls do not block
+    async def get_async(self, key: str) -> Optional[str]:
+        return self.get(key)
+
+    async def set_async(self, key: str, value: str):
+        self.set(key, value)
+
+    async def get_stamped_async(self, key: str) -> Tuple[Optional[str], Optional[int]]:
+        return self.get_stamped(key)
+
+    async def set_unless_invalidated_async(self, key: str, value: str, stamp: Optional[int]):
+        self.set_unless_invalidated(key, value, stamp)
+
+    async def get_versions_async(self, names: Iterable[str]) -> Optional[Dict[str, int]]:
+        return self.get_versions(names)
+
+    async def invalidate_async(self, keys: Iterable[str], versions: Iterable[str]):
+        self.invalidate(keys, versions)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Current counters, as exposed by the API"""
+        return self.stats.as_dict()
+
+
+class MemoryCache(NullCache):
+    """In-process cache with a TTL per entry and LRU eviction"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, ttl: int):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        # Stamp of each key invalidated lately, oldest first: (expiry, stamp)
+        self._stamps: "OrderedDict[str, tuple]" = OrderedDict()
+        self._last_stamp = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self._entries[key]
+            self.stats.evicted()
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry[1] if entry is not None else None
+
+    def _store(self, key: str, value: str) -> int:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        overflow = max(len(self._entries) - self.max_entries, 0)
+        for _ in range(overflow):
+            self._entries.popitem(last=False)
+        return overflow
+
+    def _stamp(self, key: str) -> int:
+        stamp = self._stamps.get(key)
+        return stamp[1] if stamp is not None and stamp[0] >= time.monotonic() else 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._lookup(key)
+        self.stats.record(value is not None)
+        return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            overflow = self._store(key, value)
+        if overflow:
+            self.stats.evicted(overflow)
+
+    def get_stamped(self, key: str) -> Tuple[Optional[str], Optional[int]]:
+        with self._lock:
+            value = self._lookup(key)
+            stamp = self._stamp(key)
+        self.stats.record(value is not None)
+        return value, stamp
+
+    def set_unless_invalidated(self, key: str, value: str, stamp: Optional[int]):
+        with self._lock:
+            if stamp is None or self._stamp(key) != stamp:
+                return
+            overflow = self._store(key, value)
+        if overflow:
+            self.stats.evicted(overflow)
+
+    def get_versions(self, names: Iterable[str]) -> Dict[str, int]:
+        with self._lock:
+            return {name: self._versions.get(name, 0) for name in names}
+
+    def invalidate(self, keys: Iterable[str], versions: Iterable[str]):
+        with self._lock:
+            now = time.monotonic()
+            while self._stamps and next(iter(self._stamps.values()))[0] < now:
+                self._stamps.popitem(last=False)
+            for key in keys:
+                self._entries.pop(key, None)
+                self._last_stamp += 1
+                self._stamps[key] = (now + self.ttl * STAMP_TTL_FACTOR, self._last_stamp)
+                self._stamps.move_to_end(key)
+            for name in versions:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        return {**self.stats.as_dict(), "size": len(self._entries)}
+
+
+# Stores an entry only if its stamp is unchanged, in one round trip
+SET_UNLESS_INVALIDATED_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') == ARGV[2] then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+end
+"""
+
+
+class RedisCache(NullCache):
+    """
+    Cache shared by every worker, entries expire through Redis TTLs
+    
+    The sync methods use client, the async ones async_client (a client of
+    redis.asyncio), so the event loop never waits on a socket.
+    """
+
+    name = "redis"
+
+    def __init__(self, client, ttl: int, prefix: str = "todo-cache:", async_client=None):
+        super().__init__()
+        self.client = client
+        self.async_client = async_client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._set_script = client.register_script(SET_UNLESS_INVALIDATED_SCRIPT)
+        if async_client is not None:
+            self._set_script_async = async_client.register_script(SET_UNLESS_INVALIDATED_SCRIPT)
+
+    def stamp_key(self, key: str) -> str:
+        return self.prefix + "stamp:" + key
+
+    def version_keys(self, names: Iterable[str]) -> list:
+        return [self.prefix + "version:" + name for name in names]
+
+    def decode(self, value) -> Optional[str]:
+        return value.decode() if isinstance(value, bytes) else value
+
+    def miss(self, key: str):
+        logger.warning("Could not read %s from the cache", key, exc_info=True)
+        self.stats.record(False)
+
+    def get(self, key: str) -> Optional[str]:
+        from redis.exceptions import RedisError
+
+        try:
+            value = self.client.get(self.prefix + key)
+        except RedisError:
+            self.miss(key)
+            return None
+        self.stats.record(value is not None)
+        return self.decode(value)
+
+    def set(self, key: str, value: str):
+        from redis.exceptions import RedisError
+
+        try:
+            self.client.set(self.prefix + key, value, ex=self.ttl)
+        except RedisError:
+            logger.warning("Could not store %s in the cache", key, exc_info=True)
+
+    def get_stamped(self, key: str) -> Tuple[Optional[str], Optional[int]]:
+        from redis.exceptions import RedisError
+
+        try:
+            value, stamp = self.client.mget([self.prefix + key, self.stamp_key(key)])
+        except RedisError:
+            self.miss(key)
+            return None, None
+        self.stats.record(value is not None)
+        return self.decode(value), int(stamp or 0)
+
+    def set_unless_invalidated(self, key: str, value: str, stamp: Optional[int]):
+        from redis.exceptions import RedisError
+
+        if stamp is None:
+            return
+        try:
+            self._set_script(keys=[self.prefix + key, self.stamp_key(key)], args=[value, stamp, self.ttl])
+        except RedisError:
+            logger.warning("Could not store %s in the cache", key, exc_info=True)
+
+    def get_versions(self, names: Iterable[str]) -> Optional[Dict[str, int]]:
+        from redis.exceptions import RedisError
+
+        names = list(names)
+        try:
+            values = self.client.mget(self.version_keys(names))
+        except RedisError:
+            logger.warning("Could not read cache versions", exc_info=True)
+            return None
+        return {name: int(value or 0) for name, value in zip(names, values)}
+
+    def invalidation(self, pipe, keys: Iterable[str], versions: Iterable[str]):
+        for key in keys:
+            pipe.delete(self.prefix + key)
+            pipe.incr(self.stamp_key(key))
+            pipe.expire(self.stamp_key(key), self.ttl * STAMP_TTL_FACTOR)
+        for version_key in self.version_keys(versions):
+            pipe.incr(version_key)
+        return pipe
+
+    def invalidate(self, keys: Iterable[str], versions: Iterable[str]):
+        from redis.exceptions import RedisError
+
+        # One round trip for the whole invalidation
+        try:
+            self.invalidation(self.client.pipeline(transaction=False), keys, versions).execute()
+        except RedisError:
+            # The mutation is committed: cached copies stay stale for up to the TTL
+            logger.warning("Could not invalidate cached todos", exc_info=True)
+
+    async def get_async(self, key: str) -> Optional[str]:
+        from redis.exceptions import RedisError
+
+        try:
+            value = await self.async_client.get(self.prefix + key)
+        except RedisError:
+            self.miss(key)
+            return None
+        self.stats.record(value is not None)
+        return self.decode(value)
+
+    async def set_async(self, key: str, value: str):
+        from redis.exceptions import RedisError
+
+        try:
+            await self.async_client.set(self.prefix + key, value, ex=self.ttl)
+        except RedisError:
+            logger.warning("Could not store %s in the cache", key, exc_info=True)
+
+    async def get_stamped_async(self, key: str) -> Tuple[Optional[str], Optional[int]]:
+        from redis.exceptions import RedisError
+
+        try:
+            value, stamp = await self.async_client.mget([self.prefix + key, self.stamp_key(key)])
+        except RedisError:
+            self.miss(key)
+            return None, None
+        self.stats.record(value is not None)
+        return self.decode(value), int(stamp or 0)
+
+    async def set_unless_invalidated_async(self, key: str, value: str, stamp: Optional[int]):
+        from redis.exceptions import RedisError
+
+        if stamp is None:
+            return
+        try:
+            await self._set_script_async(keys=[self.prefix + key, self.stamp_key(key)], args=[value, stamp, self.ttl])
+        except RedisError:
+            logger.warning("Could not store %s in the cache", key, exc_info=True)
+
+    async def get_versions_async(self, names: Iterable[str]) -> Optional[Dict[str, int]]:
+        from redis.exceptions import RedisError
+
+        names = list(names)
+        try:
+            values = await self.async_client.mget(self.version_keys(names))
+        except RedisError:
+            logger.warning("Could not read cache versions", exc_info=True)
+            return None
+        return {name: int(value or 0) for name, value in zip(names, values)}
+
+    async def invalidate_async(self, keys: Iterable[str], versions: Iterable[str]):
+        from redis.exceptions import RedisError
+
+        try:
+            await self.invalidation(self.async_client.pipeline(transaction=False), keys, versions).execute()
+        except RedisError:
+            logger.warning("Could not invalidate cached todos", exc_info=True)
+
+    def snapshot(self) -> Dict[str, int]:
+        from redis import RedisError
+
+        # Redis evicts on its own, so report its count (shared by all clients)
+        try:
+            evictions = int(self.client.info("stats").get("evicted_keys", 0))
+        except RedisError:
+            return self.stats.as_dict()
+        return {**self.stats.as_dict(), "evictions": evictions}
+
+
+def build_cache(backend: str) -> NullCache:
+    """Create the cache backend selected by CACHE_BACKEND"""
+    if backend == "memory":
+        return MemoryCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL)
+    if backend == "redis":
+        import redis
+        import redis.asyncio
+
+        return RedisCache(
+            redis.Redis.from_url(settings.REDIS_URL),
+            settings.CACHE_TTL,
+            async_client=redis.asyncio.Redis.from_url(settings.REDIS_URL),
+        )
+    if backend == "none":
+        return NullCache()
+    raise ValueError(f"Unknown CACHE_BACKEND '{backend}'")
+
+
+cache = build_cache(settings.CACHE_BACKEND)
+
+
+def todo_key(todo_id: int) -> str:
+    # Renamed when the ETag was added to the entries, so that entries in the
+    # older format are never read back
+    return f"todo-entry:{todo_id}"
+
+
+def page_key(versions: Dict[str, int], *parts) -> str:
+    tag = ",".join(f"{name}={version}" for name, version in sorted(versions.items()))
+    return "todos:" + tag + ":" + ":".join("" if part is None else str(part) for part in parts)
+
+
+def touched_versions(statuses: Iterable) -> set:
+    """Versions bumped by a mutation of todos with the given statuses"""
+    touched = {ALL_STATUSES}
+    touched.update(getattr(status, "value", status) for status in statuses if status is not None)
+    return touched
+
+
+def invalidate_todos(todo_ids: Iterable[int], statuses: Iterable) -> None:
+    """
+    Drop the cached copies a todo mutation makes stale
+    
+    Args:
+        todo_ids: Todos whose cached copies are dropped
+        statuses: Statuses the todos had before and after the mutation; list
+            pages filtered on them and unfiltered pages are invalidated
+    """
+    cache.invalidate([todo_key(todo_id) for todo_id in todo_ids], touched_versions(statuses))
+
+
+def invalidate_todo(todo_id: Optional[int], *statuses) -> None:
+    """
+    Drop the cached copies made stale by a mutation of one todo
+    
+    Args:
+        todo_id: Todo whose cached copy is dropped (None for creations)
+        statuses: Statuses the todo had before and after the mutation
+    """
+    invalidate_todos([todo_id] if todo_id is not None else [], statuses)
+
+
+async def invalidate_todos_async(todo_ids: Iterable[int], statuses: Iterable) -> None:
+    """Async variant of invalidate_todos, for the async repository"""
+    await cache.invalidate_async([todo_key(todo_id) for todo_id in todo_ids], touched_versions(statuses))
+
+
+async def invalidate_todo_async(todo_id: Optional[int], *statuses) -> None:
+    """Async variant of invalidate_todo, for the async repository"""
+    await invalidate_todos_async([todo_id] if todo_id is not None else [], statuses)
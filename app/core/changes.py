@@ -0,0 +1,336 @@
+"""
+Feed of the changes made to todos, pushed to WebSocket and SSE clients.
+
+todo_service publishes an event after each committed mutation. Every event
+gets a sequence number, and the latest CHANGES_BUFFER_SIZE events are kept so
+that a client reconnecting with the last number it saw receives what it
+missed. Each subscriber has a queue of at most CHANGES_QUEUE_SIZE events;
+a subscriber that falls that far behind is dropped rather than slowing the
+others down, and resumes from its last sequence number.
+
+The memory backend serves the subscribers of one process. The redis backend
+numbers events and fans them out to every worker through Redis pub/sub.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import deque
+from typing import Deque, List, NamedTuple, Optional, Set, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Event types
+CREATED = "created"
+UPDATED = "updated"
+STATUS = "status"
+DELETED = "deleted"
+IMPORTED = "imported"
+
+
+class ChangeEvent(NamedTuple):
+    seq: int
+    type: str
+    data: str  # JSON encoded event, sent as is to every subscriber
+
+
+class Lagged(Exception):
+    """The subscriber fell too far behind and was dropped"""
+
+
+def event_body(type: str, todo_id: Optional[int], todo=None, **extra) -> str:
+    """
+    JSON encoded event, without its sequence number
+    
+    Args:
+        type: Event type
+        todo_id: Todo the event is about (None for imports)
+        todo: Row of the todo after the change (optional)
+        extra: Other fields
+    
+    Returns:
+        JSON object
+    """
+    from app.schemas.todo import todo_record_adapter
+
+    body = json.dumps({"type": type, "id": todo_id, **extra}, separators=(",", ":"))
+    if todo is None:
+        return body
+    record = todo_record_adapter.dump_json({**todo._asdict(), "status": todo.status.value}).decode()
+    return body[:-1] + ',"todo":' + record + "}"
+
+
+def make_event(seq: int, type: str, body: str) -> ChangeEvent:
+    """Number an event encoded by event_body"""
+    return ChangeEvent(seq, type, '{"seq":' + str(seq) + "," + body[1:])
+
+
+class Subscription:
+    """Events waiting to be sent to one client"""
+
+    def __init__(self, feed: "ChangeFeed", limit: int):
+        self.feed = feed
+        self.limit = limit
+        self.events: Deque[ChangeEvent] = deque()
+        self.lagged = False
+        self._ready = asyncio.Event()
+
+    def push(self, event: ChangeEvent):
+        if self.lagged:
+            return
+        if len(self.events) >= self.limit:
+            self.lagged = True
+            self.feed.unsubscribe(self)
+        else:
+            self.events.append(event)
+        self._ready.set()
+
+    async def get(self) -> ChangeEvent:
+        """
+        Wait for the next event
+        
+        Raises:
+            Lagged: Once the queued events are consumed, if the subscriber
+                was dropped
+        """
+        while not self.events:
+            if self.lagged:
+                raise Lagged()
+            self._ready.clear()
+            await self._ready.wait()
+        return self.events.popleft()
+
+    def close(self):
+        self.feed.unsubscribe(self)
+
+
+class ChangeFeed:
+    """
+    In-process feed, numbering the events itself
+    
+    publish may be called from any thread; the buffer and the subscribers
+    are only touched from the event loop the feed was started on.
+    """
+
+    name = "memory"
+
+    def __init__(self, buffer_size: int, queue_size: int):
+        self.queue_size = queue_size
+        self.history: Deque[ChangeEvent] = deque(maxlen=buffer_size)
+        self.subscribers: Set[Subscription] = set()
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        self._loop = None
+
+    def publish(self, type: str, body: str):
+        """Number an event and hand it to the subscribers"""
+        with self._lock:
+            self._seq += 1
+            event = make_event(self._seq, type, body)
+            # Scheduled under the lock so the loop receives events in order
+            self._dispatch(event)
+
+    def _dispatch(self, event: ChangeEvent):
+        loop = self._loop
+        if loop is None:
+            self.history.append(event)
+            return
+        try:
+            loop.call_soon_threadsafe(self.fan_out, event)
+        except RuntimeError:
+            # The loop has been closed
+            self.history.append(event)
+
+    def fan_out(self, event: ChangeEvent):
+        self.history.append(event)
+        for subscription in list(self.subscribers):
+            subscription.push(event)
+
+    def subscribe(self, since: Optional[int] = None) -> Tuple[Subscription, bool]:
+        """
+        Register a subscriber, with the buffered events after since
+        
+        Must be called on the event loop of the feed.
+        
+        Args:
+            since: Sequence number of the last event the client received
+        
+        Returns:
+            Tuple of (subscription, whether events after since are missing
+            from the buffer, in which case the client must reload)
+        """
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        subscription = Subscription(self, self.queue_size)
+        complete = True
+        if since is not None:
+            first = self.history[0].seq if self.history else self._seq + 1
+            # A number beyond the last one was issued before a restart
+            complete = first - 1 <= since <= self._seq
+            for event in self.history:
+                if event.seq > since:
+                    subscription.events.append(event)
+        self.subscribers.add(subscription)
+        return subscription, not complete
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+
+
+# Numbers an event and publishes it in one step, so that Redis delivers
+# events in sequence order
+PUBLISH_SCRIPT = """
+local seq = redis.call('INCR', KEYS[1])
+redis.call('PUBLISH', ARGV[1], seq .. ' ' .. ARGV[2])
+return seq
+"""
+
+
+class RedisChangeFeed(ChangeFeed):
+    """
+    Feed shared by every worker: events are numbered by a Redis counter and
+    published on a channel that every worker listens to
+    
+    Events published while Redis cannot be reached are lost; subscribers
+    resuming across the gap are told to reload.
+    """
+
+    name = "redis"
+
+    RECONNECT_DELAY = 1.0
+
+    def __init__(self, client, buffer_size: int, queue_size: int, channel: str = "todo-changes"):
+        super().__init__(buffer_size, queue_size)
+        self.client = client
+        self.channel = channel
+        self._script = client.register_script(PUBLISH_SCRIPT)
+        self._listener: Optional[asyncio.Task] = None
+        self._pending: Set[asyncio.Task] = set()
+
+    async def start(self):
+        await super().start()
+        self._listener = asyncio.create_task(self.listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+        await super().stop()
+
+    def publish(self, type: str, body: str):
+        loop = self._loop
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(self._send, body)
+
+    def _send(self, body: str):
+        task = asyncio.ensure_future(self._send_async(body))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _send_async(self, body: str):
+        from redis.exceptions import RedisError
+
+        try:
+            await self._script(keys=[self.channel + ":seq"], args=[self.channel, body])
+        except RedisError:
+            logger.warning("Could not publish a todo change to Redis", exc_info=True)
+
+    async def listen(self):
+        from redis.exceptions import RedisError
+
+        while True:
+            try:
+                pubsub = self.client.pubsub()
+                await pubsub.subscribe(self.channel)
+                try:
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        data = message["data"]
+                        if isinstance(data, bytes):
+                            data = data.decode()
+                        seq, _, body = data.partition(" ")
+                        self._seq = int(seq)
+                        self.fan_out(make_event(self._seq, json.loads(body)["type"], body))
+                finally:
+                    await pubsub.aclose()
+            except RedisError:
+                logger.warning("Lost the todo change channel, reconnecting", exc_info=True)
+                await asyncio.sleep(self.RECONNECT_DELAY)
+
+
+# Sent instead of the missed events when they are no longer buffered: the
+# client reloads the todos it shows, then keeps applying the following events
+RELOAD_EVENT = '{"type":"reload"}'
+# Sent before dropping a subscriber that fell too far behind
+LAGGED_EVENT = '{"type":"lagged"}'
+
+
+async def sse_events(since: Optional[int], ping_interval: float):
+    """
+    Stream the feed in the Server-Sent Events format
+    
+    Every event carries its sequence number as id, which EventSource sends
+    back in Last-Event-ID when it reconnects.
+    
+    Args:
+        since: Sequence number of the last event the client received (optional)
+        ping_interval: Seconds of silence after which a comment is sent, so
+            proxies do not close the stream
+    
+    Yields:
+        SSE messages
+    """
+    subscription, missed = feed.subscribe(since)
+    try:
+        if missed:
+            yield f"event: reload\ndata: {RELOAD_EVENT}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), ping_interval)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            except Lagged:
+                yield f"event: lagged\ndata: {LAGGED_EVENT}\n\n"
+                return
+            yield f"id: {event.seq}\nevent: {event.type}\ndata: {event.data}\n\n"
+    finally:
+        subscription.close()
+
+
+def build_change_feed(backend: str) -> ChangeFeed:
+    """Create the change feed selected by CHANGES_BACKEND"""
+    if backend == "memory":
+        return ChangeFeed(settings.CHANGES_BUFFER_SIZE, settings.CHANGES_QUEUE_SIZE)
+    if backend == "redis":
+        import redis.asyncio
+
+        return RedisChangeFeed(
+            redis.asyncio.Redis.from_url(settings.REDIS_URL),
+            settings.CHANGES_BUFFER_SIZE,
+            settings.CHANGES_QUEUE_SIZE,
+        )
+    raise ValueError(f"Unknown CHANGES_BACKEND '{backend}'")
+
+
+feed = build_change_feed(settings.CHANGES_BACKEND)
+
+
+def publish(type: str, todo_id: Optional[int], todo=None, **extra) -> None:
+    """Publish a change committed by todo_service"""
+    feed.publish(type, event_body(type, todo_id, todo, **extra))
+
+
+def publish_rows(type: str, rows: List) -> None:
+    """Publish the same change for several todos"""
+    for row in rows:
+        feed.publish(type, event_body(type, row.id, row))
@@ -0,0 +1,99 @@
+"""
+Strong ETags of todos and of list pages, and the conditional request headers
+matched against them.
+
+A todo's ETag is its id and updated_at, which every mutation changes, so
+If-Match can be checked by the UPDATE itself. A list page's ETag hashes
+the request parameters with the versions of the status counters, which
+every mutation bumps, so If-None-Match is answered without reading todos.
+"""
+from datetime import datetime
+from starlette.responses import Response
+from typing import Dict, List, Optional
+import hashlib
+import json
+
+# Condition of If-Match: *, met by the todo whatever its updated_at, but not
+# by a missing todo
+ANY_VERSION: List[Optional[datetime]] = []
+
+
+def todo_etag(todo_id: int, updated_at: Optional[datetime]) -> str:
+    """ETag of a todo at a given updated_at"""
+    return f'"{todo_id}-{updated_at.isoformat() if updated_at else ""}"'
+
+
+def list_etag(versions: Dict[str, int], *parts) -> str:
+    """ETag of a list page, from the versions it depends on and its parameters"""
+    key = json.dumps([sorted(versions.items()), [None if part is None else str(part) for part in parts]])
+    return '"' + hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + '"'
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    # fromisoformat only accepts a trailing Z from Python 3.11
+    return datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+
+
+def parse_header(header: Optional[str]) -> List[str]:
+    """Entity tags listed in an If-Match or If-None-Match header"""
+    if not header:
+        return []
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def none_match(header: Optional[str], etag: str) -> bool:
+    """
+    Check If-None-Match against the current ETag, with the weak comparison
+    RFC 9110 prescribes for it
+    
+    Args:
+        header: If-None-Match header (optional)
+        etag: Current ETag of the resource
+    
+    Returns:
+        True when the client's copy is current and 304 can be answered
+    """
+    for tag in parse_header(header):
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def expected_versions(header: Optional[str], todo_id: int) -> Optional[List[Optional[datetime]]]:
+    """
+    Turn the If-Match header of a todo mutation into the updated_at values
+    the todo may have
+    
+    Args:
+        header: If-Match header (optional)
+        todo_id: Todo the request changes
+    
+    Returns:
+        None when the mutation is unconditional (no header), ANY_VERSION for
+        *, otherwise the accepted updated_at values, empty when no tag can
+        match
+    """
+    tags = parse_header(header)
+    if not tags:
+        return None
+    if "*" in tags:
+        return ANY_VERSION
+    expected = []
+    for tag in tags:
+        # If-Match uses the strong comparison, weak tags never match
+        if not (tag.startswith('"') and tag.endswith('"')):
+            continue
+        tag_id, _, updated_at = tag[1:-1].partition("-")
+        try:
+            if int(tag_id) == todo_id:
+                expected.append(parse_timestamp(updated_at))
+        except ValueError:
+            continue
+    return expected
+
+
+def not_modified(etag: str) -> Response:
+    """304 response confirming the client's copy"""
+    return Response(status_code=304, headers={"ETag": etag})
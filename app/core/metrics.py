@@ -0,0 +1,141 @@
+"""
+Prometheus metrics of the HTTP requests and of the SQL they run.
+
+Requests are labelled by route template (/api/v1/todos/{todo_id}) rather
+than by path, so the number of series stays bounded.
+"""
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Gauge, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from starlette.responses import Response
+from app.db.database import count_statements, pool_status
+import os
+import time
+
+# Route label of requests that did not match any route
+UNMATCHED_ROUTE = "<unmatched>"
+
+SERVER_TIMING_HEADER = b"server-timing"
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request, until its response has been sent",
+    ["method", "route", "status"],
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements",
+    "SQL statements executed while handling a request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100, float("inf")),
+)
+REQUEST_SQL_DURATION = Histogram(
+    "http_request_sql_duration_seconds",
+    "Time spent executing SQL statements while handling a request",
+    ["method", "route"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests being handled",
+    multiprocess_mode="livesum",
+)
+
+# Fields of app.db.database.pool_status exported as gauges
+POOL_FIELDS = {
+    "checkedOut": ("db_pool_checked_out", "Connections checked out of the pool"),
+    "checkedIn": ("db_pool_checked_in", "Idle connections in the pool"),
+    "overflow": ("db_pool_overflow", "Connections open beyond the pool size"),
+    "checkouts": ("db_pool_checkouts", "Connections checked out since startup"),
+    "timeouts": ("db_pool_timeouts", "Checkouts that gave up waiting for a connection"),
+    "waitTotalMs": ("db_pool_wait_milliseconds", "Total time spent waiting for a connection"),
+}
+
+
+class PoolCollector:
+    """Read the connection pools of every engine at scrape time"""
+
+    def collect(self):
+        families = {
+            field: GaugeMetricFamily(name, documentation, labels=["engine"])
+            for field, (name, documentation) in POOL_FIELDS.items()
+        }
+        for engine, snapshot in pool_status().items():
+            for field, family in families.items():
+                if field in snapshot:
+                    family.add_metric([engine], snapshot[field])
+        return list(families.values())
+
+
+REGISTRY.register(PoolCollector())
+
+
+def route_template(scope) -> str:
+    """Path template of the route that handled a request"""
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+def metrics_response() -> Response:
+    """Render every metric in the Prometheus text format"""
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Aggregate the metrics written by every worker process
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+class MetricsMiddleware:
+    """
+    Record the latency of each request with the number and duration of the
+    SQL statements it ran, optionally reporting them in a Server-Timing header
+    """
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+        self._series = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+        REQUESTS_IN_PROGRESS.inc()
+        with count_statements() as counter:
+            async def send_with_status(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    if self.server_timing:
+                        elapsed = (time.perf_counter() - started) * 1000
+                        timing = (
+                            f"app;dur={elapsed:.1f}, "
+                            f"db;dur={counter.duration * 1000:.1f};desc=\"{counter.count} statements\""
+                        )
+                        headers = list(message.get("headers", []))
+                        headers.append((SERVER_TIMING_HEADER, timing.encode()))
+                        message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                REQUESTS_IN_PROGRESS.dec()
+                duration, statements, sql_duration = self.series(scope["method"], route_template(scope), status)
+                duration.observe(time.perf_counter() - started)
+                statements.observe(counter.count)
+                sql_duration.observe(counter.duration)
+
+    def series(self, method: str, route: str, status: int) -> tuple:
+        """Labelled histograms of a request, looked up once per label set"""
+        key = (method, route, status)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = (
+                REQUEST_DURATION.labels(method, route, str(status)),
+                REQUEST_SQL_STATEMENTS.labels(method, route),
+                REQUEST_SQL_DURATION.labels(method, route),
+            )
+        return series
@@ -0,0 +1,28 @@
+from app.db.database import count_statements
+
+# Response header carrying the number of SQL statements of the request
+SQL_STATEMENTS_HEADER = b"x-sql-statements"
+
+
+class SQLStatementCountMiddleware:
+    """
+    Count the SQL statements run by each request and report them in the
+    X-SQL-Statements response header, so tests can assert query budgets
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        with count_statements() as counter:
+            async def send_with_count(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((SQL_STATEMENTS_HEADER, str(counter.count).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_count)
@@ -0,0 +1,261 @@
+"""
+Per-client rate limiting of the API.
+
+Each client may send RATE_LIMIT_REQUESTS requests per RATE_LIMIT_PERIOD
+seconds. The memory backend keeps a token bucket per client in the process,
+the redis backend shares a sliding window between every worker.
+
+Clients are told apart by the address of the connection, or behind the
+proxies listed in RATE_LIMIT_TRUSTED_PROXIES by X-Forwarded-For.
+"""
+import math
+import threading
+import time
+from ipaddress import IPv4Network, IPv6Network, ip_address, ip_network
+from typing import Dict, Iterable, List, NamedTuple, Union
+
+from app.core.config import settings
+
+RETRY_AFTER_HEADER = b"retry-after"
+LIMIT_HEADER = b"x-ratelimit-limit"
+REMAINING_HEADER = b"x-ratelimit-remaining"
+
+Network = Union[IPv4Network, IPv6Network]
+
+
+class Decision(NamedTuple):
+    """Outcome of a rate limit check"""
+    allowed: bool
+    remaining: int
+    retry_after: float  # in seconds, 0 when allowed
+
+
+class TokenBucketLimiter:
+    """
+    In-process token buckets, refilled continuously at limit / period tokens
+    per second and holding at most limit tokens
+
+    Checks never yield to the event loop while holding the lock, so one lock
+    makes them safe both for the threadpool and the event loop.
+    """
+
+    name = "memory"
+
+    # Number of checks between two sweeps of the buckets that are full again
+    SWEEP_INTERVAL = 10000
+
+    def __init__(self, limit: int, period: float):
+        self.limit = limit
+        self.rate = limit / period
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._checks = 0
+
+    async def hit(self, key: str) -> Decision:
+        return self.check(key)
+
+    def check(self, key: str) -> Decision:
+        """Take a token from the bucket of key, if it has one"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.limit), now]
+            tokens = min(self.limit, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            bucket[0] = tokens
+
+            self._checks += 1
+            if self._checks >= self.SWEEP_INTERVAL:
+                self._sweep(now)
+
+        if allowed:
+            return Decision(True, int(tokens), 0.0)
+        return Decision(False, 0, (1 - tokens) / self.rate)
+
+    def _sweep(self, now: float):
+        # A bucket that has refilled behaves exactly like a missing one
+        self._checks = 0
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if bucket[0] + (now - bucket[1]) * self.rate < self.limit
+        }
+
+
+# Sliding window approximated from the counts of the current and previous
+# fixed windows, stored as two fields of one hash per client. The window is
+# taken from the server clock so every worker agrees on it.
+SLIDING_WINDOW_SCRIPT = """
+local period = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local window = math.floor(now / period)
+local elapsed = now - window * period
+
+local current = tonumber(redis.call('HGET', KEYS[1], window) or '0')
+local previous = tonumber(redis.call('HGET', KEYS[1], window - 1) or '0')
+local used = previous * (period - elapsed) / period + current
+
+if used + 1 > limit then
+    -- Time until enough of the previous window has slid out, which is
+    -- after the next window starts when the current one is full
+    local retry
+    if current + 1 <= limit then
+        retry = period - elapsed - (limit - current - 1) * period / previous
+    else
+        retry = period - elapsed + period * (1 - (limit - 1) / current)
+    end
+    return {0, 0, tostring(retry)}
+end
+
+redis.call('HINCRBY', KEYS[1], window, 1)
+redis.call('HDEL', KEYS[1], window - 2)
+redis.call('EXPIRE', KEYS[1], math.ceil(period * 2))
+return {1, math.floor(limit - used - 1), '0'}
+"""
+
+
+class RedisSlidingWindowLimiter:
+    """
+    Sliding window shared through Redis, checked by one atomic script
+
+    Requests are let through when Redis cannot be reached, so that an outage
+    of the limiter does not take the API down with it.
+    """
+
+    name = "redis"
+
+    def __init__(self, client, limit: int, period: float, prefix: str = "ratelimit:"):
+        self.client = client
+        self.limit = limit
+        self.period = period
+        self.prefix = prefix
+        self._script = client.register_script(SLIDING_WINDOW_SCRIPT)
+
+    async def hit(self, key: str) -> Decision:
+        from redis.exceptions import RedisError
+
+        try:
+            allowed, remaining, retry_after = await self._script(
+                keys=[self.prefix + key], args=[self.period, self.limit]
+            )
+        except RedisError:
+            return Decision(True, self.limit, 0.0)
+        return Decision(bool(allowed), int(remaining), max(float(retry_after), 0.0))
+
+
+def build_limiter(backend: str):
+    """Create the rate limit backend selected by RATE_LIMIT_BACKEND"""
+    if backend == "memory":
+        return TokenBucketLimiter(settings.RATE_LIMIT_REQUESTS, settings.RATE_LIMIT_PERIOD)
+    if backend == "redis":
+        import redis.asyncio
+
+        return RedisSlidingWindowLimiter(
+            redis.asyncio.Redis.from_url(settings.REDIS_URL),
+            settings.RATE_LIMIT_REQUESTS,
+            settings.RATE_LIMIT_PERIOD,
+        )
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND '{backend}'")
+
+
+def parse_networks(addresses: Iterable[str]) -> List[Network]:
+    """Parse RATE_LIMIT_TRUSTED_PROXIES, where a plain address is a network of one"""
+    return [ip_network(address.strip(), strict=False) for address in addresses]
+
+
+def is_trusted(address: str, proxies: List[Network]) -> bool:
+    try:
+        ip = ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in proxies)
+
+
+def client_key(scope, trusted_proxies: List[Network] = ()) -> str:
+    """
+    Identify the client of a request by its address
+    
+    Requests from a trusted proxy are keyed by the address that proxy
+    received them from: the last address of X-Forwarded-For that is not a
+    trusted proxy itself. Addresses further left are set by the client and
+    cannot be trusted.
+    
+    Args:
+        scope: ASGI scope of the request
+        trusted_proxies: Networks of the proxies in front of the API
+    
+    Returns:
+        Client address
+    """
+    client = scope.get("client")
+    address = client[0] if client else "unknown"
+    if not trusted_proxies or not is_trusted(address, trusted_proxies):
+        return address
+    forwarded = [
+        value.decode("latin-1")
+        for name, value in scope.get("headers", ())
+        if name == b"x-forwarded-for"
+    ]
+    for hop in reversed(",".join(forwarded).split(",")):
+        hop = hop.strip()
+        if not hop:
+            continue
+        address = hop
+        if not is_trusted(hop, trusted_proxies):
+            break
+    return address
+
+
+class RateLimitMiddleware:
+    """
+    Reject requests beyond the limit of their client with 429 and a
+    Retry-After header, before they reach the routes or the database
+    """
+
+    def __init__(self, app, limiter, exempt_paths: Iterable[str] = (), trusted_proxies: Iterable[str] = ()):
+        self.app = app
+        self.limiter = limiter
+        self.exempt_paths = frozenset(exempt_paths)
+        self.trusted_proxies = parse_networks(trusted_proxies)
+        self._limit = str(limiter.limit).encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            return await self.app(scope, receive, send)
+
+        decision = await self.limiter.hit(client_key(scope, self.trusted_proxies))
+        if not decision.allowed:
+            return await self.reject(decision, send)
+
+        remaining = str(decision.remaining).encode()
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((LIMIT_HEADER, self._limit))
+                headers.append((REMAINING_HEADER, remaining))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    async def reject(self, decision: Decision, send):
+        body = b'{"detail":"Too many requests"}'
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (RETRY_AFTER_HEADER, str(max(1, math.ceil(decision.retry_after))).encode()),
+                (LIMIT_HEADER, self._limit),
+                (REMAINING_HEADER, b"0"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
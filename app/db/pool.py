@@ -0,0 +1,83 @@
+"""
+Connection pools reporting how long connections are waited for.
+
+The pools behave exactly like their SQLAlchemy counterparts; they only time
+every checkout and count the ones that gave up after pool_timeout.
+"""
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+import threading
+import time
+
+
+class PoolStats:
+    """Checkout counters of a pool, safe to update from several threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float, timed_out: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "waitTotalMs": round(self.wait_total * 1000, 3),
+                "waitMaxMs": round(self.wait_max * 1000, 3),
+                "waitAvgMs": round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+            }
+
+
+class InstrumentedPoolMixin:
+    """Time the checkouts of a QueuePool, keeping the stats when it is recreated"""
+
+    stats: PoolStats
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        began = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self.stats.record(time.perf_counter() - began, timed_out)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def snapshot(self) -> dict:
+        """Current occupancy of the pool along with its checkout stats"""
+        return {
+            "size": self.size(),
+            "checkedIn": self.checkedin(),
+            "checkedOut": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "maxOverflow": self._max_overflow,
+            **self.stats.snapshot(),
+        }
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
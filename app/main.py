@@ -1,18 +1,50 @@
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from app.db.database import create_tables
+from app.core import changes
+from app.core.config import settings
+from app.db.database import dispose_engines, init_engines, pool_status
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Engines are built per worker once it starts serving, without any DDL:
+    # the schema is managed by the migrations (alembic upgrade head)
+    init_engines()
+    await changes.feed.start()
+    yield
+    await changes.feed.stop()
+    await dispose_engines()
+
 
 def create_app():
     from fastapi import FastAPI
+    from fastapi.responses import JSONResponse
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
     from app.api.v1.routes import router as v1_router
     
+    if settings.DATABASE_ASYNC:
+        from app.api.v1.async_routes import override_routes, router as async_v1_router
+        v1_router = override_routes(v1_router, async_v1_router)
+    
     app = FastAPI(
         title="Todo API",
         version="1.0.0",
         openapi_url="/api/v1/openapi.json",
-        docs_url="/api/v1/docs"
+        docs_url="/api/v1/docs",
+        lifespan=lifespan,
     )
     
+    # Rate limiting, added before CORS so that rejected requests still get its headers
+    if settings.RATE_LIMIT_ENABLED:
+        from app.core.rate_limit import RateLimitMiddleware, build_limiter
+        app.add_middleware(
+            RateLimitMiddleware,
+            limiter=build_limiter(settings.RATE_LIMIT_BACKEND),
+            exempt_paths=settings.RATE_LIMIT_EXEMPT_PATHS,
+            trusted_proxies=settings.RATE_LIMIT_TRUSTED_PROXIES,
+        )
+    
     # Setup CORS
     app.add_middleware(
         CORSMiddleware,
@@ -20,8 +52,19 @@ def create_app():
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Lets browser clients read the ETag to send it back in If-Match
+        expose_headers=["ETag"],
     )
     
+    if settings.SQL_COUNT_HEADER:
+        from app.core.middleware import SQLStatementCountMiddleware
+        app.add_middleware(SQLStatementCountMiddleware)
+    
+    if settings.METRICS_ENABLED:
+        from app.core.metrics import MetricsMiddleware, metrics_response
+        app.add_middleware(MetricsMiddleware, server_timing=settings.SERVER_TIMING_HEADER)
+        app.add_route("/metrics", lambda request: metrics_response(), include_in_schema=False)
+    
     # Include routes
     app.include_router(v1_router, prefix="/api/v1")
     
@@ -29,8 +72,18 @@ def create_app():
     def health_check():
         return {"status": "ok"}
     
-    # Create database tables
-    create_tables()
+    @app.get("/health/pool")
+    def pool_health():
+        return pool_status()
+    
+    @app.exception_handler(PoolTimeoutError)
+    def pool_timeout_handler(request, exc):
+        # No connection freed up within DATABASE_POOL_TIMEOUT
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Database is busy, try again later"},
+            headers={"Retry-After": "1"},
+        )
     
     return app
 
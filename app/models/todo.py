@@ -1,10 +1,30 @@
-from sqlalchemy import Column, Integer, String, Enum, DateTime, func
+from sqlalchemy import BigInteger, Column, Integer, String, Enum, DateTime, Index, func
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.sql.expression import FunctionElement
 import enum
 
 Base = declarative_base()
 
 
+class utcnow(FunctionElement):
+    """Current timestamp, rendered so that it sorts like bound datetimes"""
+    type = DateTime(timezone=True)
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _compile_utcnow(element, compiler, **kw):
+    return compiler.process(func.now(), **kw)
+
+
+@compiles(utcnow, "sqlite")
+def _compile_utcnow_sqlite(element, compiler, **kw):
+    # CURRENT_TIMESTAMP has no fractional part on SQLite, which breaks
+    # comparisons against the microsecond format SQLAlchemy binds
+    return "(STRFTIME('%Y-%m-%d %H:%M:%f000', 'now'))"
+
+
 class TodoStatusEnum(str, enum.Enum):
     new = "new"
     in_progress = "in-progress"
@@ -13,10 +33,30 @@ class TodoStatusEnum(str, enum.Enum):
 
 class Todo(Base):
     __tablename__ = "todos"
+    __table_args__ = (
+        # Composite indexes backing the (sort column, id) keyset pagination,
+        # with and without the status filter
+        Index("ix_todos_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_todos_status_updated_at_id", "status", "updated_at", "id"),
+        Index("ix_todos_created_at_id", "created_at", "id"),
+        Index("ix_todos_updated_at_id", "updated_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
     description = Column(String, nullable=True)
     status = Column(Enum(TodoStatusEnum), default=TodoStatusEnum.new)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=utcnow())
+    updated_at = Column(DateTime(timezone=True), onupdate=utcnow(), default=utcnow())
+
+
+class TodoCounter(Base):
+    """
+    Number of todos per status, and a version bumped by every mutation of
+    those todos, maintained by the todo service
+    """
+    __tablename__ = "todo_counters"
+
+    status = Column(Enum(TodoStatusEnum), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+    version = Column(BigInteger, nullable=False, default=0)
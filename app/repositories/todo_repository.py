@@ -0,0 +1,330 @@
+"""
+Async implementation of app.services.todo_service, used when DATABASE_ASYNC
+is enabled. Functions mirror the sync service one to one.
+"""
+from sqlalchemy import asc, desc, func, select, tuple_
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import changes
+from app.core.cache import invalidate_todo_async, invalidate_todos_async
+from app.core.config import settings
+from app.core.etag import ANY_VERSION
+from app.models.todo import Todo, TodoStatusEnum
+from app.schemas.todo import TodoCreate, TodoUpdate
+from app.services import counter_service, search_service
+from app.services.todo_service import (
+    PreconditionFailed,
+    RELEVANCE,
+    SEARCH_FIELDS,
+    SORT_COLUMNS,
+    TODO_COLUMNS,
+    check_sort,
+    counter_key,
+    create_many_statement,
+    create_parameters,
+    create_statement,
+    decode_cursor,
+    delete_statement,
+    encode_cursor,
+    estimate_count,
+    exists_statement,
+    update_statement,
+)
+from datetime import datetime
+from typing import Dict, Optional, Tuple, List
+
+
+async def create_todo(db: AsyncSession, data: TodoCreate) -> Row:
+    """
+    Create a new todo item in the database
+    
+    Args:
+        db: Async database session
+        data: Todo creation data
+        
+    Returns:
+        Created todo row
+    """
+    todo = await insert_todo(db, data)
+    await created([todo])
+    return todo
+
+
+async def insert_todo(db: AsyncSession, data: TodoCreate) -> Row:
+    """Write and commit a new todo, leaving the post-commit hooks to the caller"""
+    todo = (await db.execute(create_statement(data))).one()
+    await db.run_sync(search_service.index_todos, [todo], False)
+    await db.execute(counter_service.increment_statement(TodoStatusEnum.new))
+    await db.commit()
+    return todo
+
+
+async def created(rows: List[Row]) -> None:
+    """Post-commit hooks of created todos: invalidate cached lists and publish the changes"""
+    await invalidate_todos_async([], [TodoStatusEnum.new])
+    changes.publish_rows(changes.CREATED, rows)
+
+
+async def create_todos(db: AsyncSession, items: List[TodoCreate]) -> List[Row]:
+    """
+    Create several todos with one multi-row INSERT ... RETURNING
+    
+    Args:
+        db: Async database session
+        items: Todo creation data
+        
+    Returns:
+        Created rows, in the order of items
+    """
+    if not items:
+        return []
+    rows = await insert_todos(db, items)
+    await created(rows)
+    return rows
+
+
+async def insert_todos(db: AsyncSession, items: List[TodoCreate]) -> List[Row]:
+    """Write and commit several new todos, leaving the post-commit hooks to the caller"""
+    rows = (await db.execute(create_many_statement(), create_parameters(items))).all()
+    await db.run_sync(search_service.index_todos, rows, False)
+    await db.execute(counter_service.increment_statement(TodoStatusEnum.new, len(rows)))
+    await db.commit()
+    return rows
+
+
+async def get_todos(
+    db: AsyncSession,
+    limit: int,
+    offset: int,
+    status: Optional[str] = None,
+    sort_by: str = "createdAt",
+    order: str = "desc",
+    cursor: Optional[str] = None,
+    q: Optional[str] = None
+) -> Tuple[int, List[Row], Optional[str]]:
+    """
+    Get todos with filtering, searching, sorting and pagination
+    
+    See todo_service.get_todos for the pagination rules.
+    
+    Args:
+        db: Async database session
+        limit: Maximum number of items to return
+        offset: Number of items to skip
+        status: Filter by status (optional)
+        sort_by: Field to sort by (createdAt, updatedAt, or relevance with q)
+        order: Sort order (asc or desc)
+        cursor: Opaque cursor returned by a previous call (optional)
+        q: Full-text search over title and description (optional)
+        
+    Returns:
+        Tuple of (total count, list of todo rows, cursor for the next page or None)
+        
+    Raises:
+        ValueError: If the cursor is invalid, or relevance is requested
+            without a search or with a cursor
+    """
+    check_sort(sort_by, cursor, q)
+    stmt = select(*TODO_COLUMNS)
+    if status:
+        stmt = stmt.where(Todo.status == status)
+    if q is not None:
+        stmt, rank = search_service.apply_search(
+            stmt, q, db.bind.dialect.name, await db.run_sync(search_service.fts_available)
+        )
+
+    # Get total count before pagination
+    key = counter_key(status) if q is None else False
+    if key is not False:
+        counts = counter_service.counts_from_rows(await db.execute(counter_service.counts_statement()))
+        total = counts[key] if key else sum(counts.values())
+    elif settings.LIST_TOTAL_ESTIMATE:
+        total = await db.run_sync(estimate_count, stmt)
+    else:
+        total = await db.scalar(select(func.count()).select_from(stmt.subquery()))
+
+    # Apply sorting, using id as tie-breaker
+    order_func = desc if order == "desc" else asc
+    sort_column = rank if sort_by == RELEVANCE else SORT_COLUMNS[sort_by]
+    stmt = stmt.order_by(order_func(sort_column), order_func(Todo.id))
+
+    # Apply pagination, fetching one extra row to know if there is a next page
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_by, order)
+        key = tuple_(sort_column, Todo.id)
+        stmt = stmt.where(key < (value, last_id) if order == "desc" else key > (value, last_id))
+    else:
+        stmt = stmt.offset(offset)
+    todos = (await db.execute(stmt.limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(todos) > limit:
+        todos = todos[:limit]
+        if sort_by != RELEVANCE:
+            next_cursor = encode_cursor(sort_by, order, todos[-1])
+    return total, todos, next_cursor
+
+
+async def get_versions(db: AsyncSession) -> Dict[str, int]:
+    """
+    Get the version of every status, bumped by each mutation of its todos
+    
+    Args:
+        db: Async database session
+        
+    Returns:
+        Mapping of status value to version, with every status present
+    """
+    return counter_service.versions_from_rows(await db.execute(counter_service.versions_statement()))
+
+
+async def get_todo_updated_at(db: AsyncSession, todo_id: int) -> Tuple[bool, Optional[datetime]]:
+    """Async variant of todo_service.get_todo_updated_at"""
+    row = (await db.execute(select(Todo.updated_at).where(Todo.id == todo_id))).first()
+    return (row is not None, row.updated_at if row is not None else None)
+
+
+async def check_missing(db: AsyncSession, todo_id: int, expected: Optional[list]) -> None:
+    """Async variant of todo_service.check_missing"""
+    if expected is ANY_VERSION:
+        raise PreconditionFailed(f"Todo {todo_id} does not exist")
+    if expected is not None and await db.scalar(exists_statement(todo_id)) is not None:
+        raise PreconditionFailed(f"Todo {todo_id} has been modified")
+
+
+async def get_counts(db: AsyncSession) -> Dict[TodoStatusEnum, int]:
+    """
+    Get the number of todos per status
+    
+    Args:
+        db: Async database session
+        
+    Returns:
+        Mapping of status to count, with every status present
+    """
+    return counter_service.counts_from_rows(await db.execute(counter_service.counts_statement()))
+
+
+async def get_todo(db: AsyncSession, todo_id: int) -> Optional[Row]:
+    """
+    Get a todo by ID
+    
+    Args:
+        db: Async database session
+        todo_id: Todo ID
+        
+    Returns:
+        Todo row or None if not found
+    """
+    return (await db.execute(select(*TODO_COLUMNS).where(Todo.id == todo_id))).first()
+
+
+async def update_todo(
+    db: AsyncSession,
+    todo_id: int,
+    update_data: TodoUpdate,
+    expected: Optional[List[Optional[datetime]]] = None
+) -> Optional[Row]:
+    """
+    Update a todo with a single UPDATE ... RETURNING
+    
+    Args:
+        db: Async database session
+        todo_id: Todo ID
+        update_data: Data to update
+        expected: updated_at values the todo must have, from If-Match (optional)
+        
+    Returns:
+        Updated todo row or None if not found
+        
+    Raises:
+        PreconditionFailed: If the todo does not have an expected updated_at
+    """
+    update_dict = update_data.model_dump(exclude_unset=True)
+    if "status" in update_dict:
+        update_dict["status"] = TodoStatusEnum(update_dict["status"])
+        return await update_status(db, todo_id, update_dict.pop("status"), expected, **update_dict)
+
+    todo = (await db.execute(update_statement(todo_id, update_dict, expected))).one_or_none()
+    if not todo:
+        await db.rollback()
+        await check_missing(db, todo_id, expected)
+        return None
+    if SEARCH_FIELDS & update_dict.keys():
+        await db.run_sync(search_service.index_todos, [todo])
+    await db.execute(counter_service.touch_statement([todo.status]))
+    await db.commit()
+    await invalidate_todo_async(todo_id, todo.status)
+    changes.publish(changes.UPDATED, todo_id, todo)
+    return todo
+
+
+async def update_status(
+    db: AsyncSession,
+    todo_id: int,
+    status: TodoStatusEnum,
+    expected: Optional[List[Optional[datetime]]] = None,
+    **values
+) -> Optional[Row]:
+    """
+    Update todo status, and optionally other fields
+    
+    See todo_service.update_status for the statement order.
+    
+    Args:
+        db: Async database session
+        todo_id: Todo ID
+        status: New status
+        expected: updated_at values the todo must have, from If-Match (optional)
+        values: Other columns to update
+        
+    Returns:
+        Updated todo row or None if not found
+        
+    Raises:
+        PreconditionFailed: If the todo does not have an expected updated_at
+    """
+    changed = (await db.scalars(counter_service.move_statement(todo_id, status))).all()
+    todo = (await db.execute(update_statement(todo_id, {**values, "status": status}, expected))).one_or_none()
+    if not todo:
+        await db.rollback()
+        await check_missing(db, todo_id, expected)
+        return None
+    if SEARCH_FIELDS & values.keys():
+        await db.run_sync(search_service.index_todos, [todo])
+    if not changed:
+        await db.execute(counter_service.touch_statement([status]))
+    await db.commit()
+    await invalidate_todo_async(todo_id, counter_service.previous_status(changed, status), status)
+    changes.publish(changes.STATUS, todo_id, todo)
+    return todo
+
+
+async def delete_todo(db: AsyncSession, todo_id: int, expected: Optional[List[Optional[datetime]]] = None) -> bool:
+    """
+    Delete a todo with a single DELETE ... RETURNING
+    
+    Args:
+        db: Async database session
+        todo_id: Todo ID
+        expected: updated_at values the todo must have, from If-Match (optional)
+        
+    Returns:
+        True if deleted, False if not found
+        
+    Raises:
+        PreconditionFailed: If the todo does not have an expected updated_at
+    """
+    deleted = (await db.execute(delete_statement(todo_id, expected))).one_or_none()
+    if not deleted:
+        await db.rollback()
+        await check_missing(db, todo_id, expected)
+        return False
+    await db.run_sync(search_service.unindex_todos, [todo_id])
+    stmt = counter_service.increment_statement(deleted.status, -1)
+    if stmt is not None:
+        await db.execute(stmt)
+    await db.commit()
+    await invalidate_todo_async(todo_id, deleted.status)
+    changes.publish(changes.DELETED, todo_id)
+    return True
@@ -1,7 +1,8 @@
 from datetime import datetime
 from enum import Enum
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, Field, TypeAdapter, field_validator
+from typing import Dict, Optional, List
+from typing_extensions import TypedDict
 
 
 class TodoStatus(str, Enum):
@@ -20,6 +21,14 @@ class TodoUpdate(BaseModel):
     description: Optional[str] = None
     status: Optional[TodoStatus] = None
 
+    @field_validator("status")
+    @classmethod
+    def status_not_null(cls, status: Optional[TodoStatus]) -> TodoStatus:
+        # The status may be left out, but a todo always has one
+        if status is None:
+            raise ValueError("status cannot be null")
+        return status
+
 
 class TodoResponse(BaseModel):
     id: int
@@ -48,4 +57,78 @@ class TodoListResponse(BaseModel):
     total: int
     limit: int
     offset: int
-    data: List[TodoResponse]
\ No newline at end of file
+    data: List[TodoResponse]
+    nextCursor: Optional[str] = None
+
+
+class TodoRecord(TypedDict):
+    """Serialized form of TodoResponse, built straight from a todos row"""
+    id: int
+    title: str
+    description: Optional[str]
+    status: str
+    created_at: datetime
+    updated_at: datetime
+
+
+class TodoPage(TypedDict):
+    """Serialized form of TodoListResponse"""
+    total: int
+    limit: int
+    offset: int
+    data: List[TodoRecord]
+    nextCursor: Optional[str]
+
+
+# Serializers for the read paths, which skip model validation entirely
+todo_record_adapter = TypeAdapter(TodoRecord)
+todo_page_adapter = TypeAdapter(TodoPage)
+
+
+class TodoBatchCreate(BaseModel):
+    items: List[TodoCreate]
+
+
+class TodoBatchStatusUpdate(BaseModel):
+    ids: List[int]
+    status: TodoStatus
+
+
+class TodoBatchDelete(BaseModel):
+    ids: List[int]
+
+
+class TodoBatchItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    code: int
+    data: Optional[TodoResponse] = None
+    error: Optional[str] = None
+
+
+class TodoBatchResponse(BaseModel):
+    results: List[TodoBatchItemResult]
+
+
+class TodoImportError(BaseModel):
+    line: int
+    error: str
+
+
+class TodoImportResponse(BaseModel):
+    imported: int
+    failed: int
+    errors: List[TodoImportError]
+
+
+class TodoStatsResponse(BaseModel):
+    total: int
+    byStatus: Dict[str, int]
+
+
+class CacheStatsResponse(BaseModel):
+    backend: str
+    hits: int
+    misses: int
+    evictions: int
+    size: Optional[int] = None
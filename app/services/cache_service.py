@@ -0,0 +1,224 @@
+"""
+Read-through cache in front of todo_service.get_todo and get_todos.
+
+Entries hold the JSON body of each response, encoded straight from the
+selected rows with the precompiled serializers of app.schemas.todo, so that
+reads never build ORM instances or validate response models. Todo entries
+also hold the ETag of the todo, ahead of its body. The mutations in
+todo_service invalidate them through app.core.cache.invalidate_todo. The
+async variants go through the async methods of the cache backend.
+"""
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.etag import list_etag as page_etag, todo_etag
+from app.core.cache import ALL_STATUSES, cache, page_key, todo_key
+from app.schemas.todo import todo_page_adapter, todo_record_adapter
+from app.repositories import todo_repository
+from app.services import counter_service, todo_service
+from typing import Dict, Optional, List, Tuple
+
+
+def record(row: Row) -> dict:
+    """Convert a todo row into the fields of a TodoResponse"""
+    return {
+        "id": row.id,
+        "title": row.title,
+        "description": row.description,
+        "status": row.status.value,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+    }
+
+
+def encode_todo(row: Row) -> str:
+    """Encode a todo row as the JSON body of a TodoResponse"""
+    return todo_record_adapter.dump_json(record(row)).decode()
+
+
+def encode_entry(row: Row) -> str:
+    """Encode a todo row as a cache entry: its ETag, a newline, then its JSON body"""
+    # The JSON body has no raw newline, the first one ends the ETag
+    return todo_etag(row.id, row.updated_at) + "\n" + encode_todo(row)
+
+
+def decode_entry(entry: str) -> Tuple[str, str]:
+    """Split a cache entry of a todo into its JSON body and its ETag"""
+    etag, _, body = entry.partition("\n")
+    return body, etag
+
+
+def encode_page(
+    total: int,
+    limit: int,
+    offset: int,
+    rows: List[Row],
+    next_cursor: Optional[str]
+) -> str:
+    """Encode a page of todo rows as the JSON body of a TodoListResponse"""
+    return todo_page_adapter.dump_json({
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "data": [record(row) for row in rows],
+        "nextCursor": next_cursor,
+    }).decode()
+
+
+def list_key(limit, offset, status, sort_by, order, cursor, q=None, etag=None) -> Optional[str]:
+    """
+    Cache key of a list page at the current version of its status, None when
+    the version cannot be read and the cache must be bypassed
+    """
+    # The version is read before the database so a concurrent mutation can
+    # only make the entry stored for it unreachable, never stale
+    versions = cache.get_versions([status or ALL_STATUSES])
+    if versions is None:
+        return None
+    return page_key(versions, status, sort_by, order, limit, offset, cursor, q, etag)
+
+
+async def list_key_async(limit, offset, status, sort_by, order, cursor, q=None, etag=None) -> Optional[str]:
+    """Async variant of list_key"""
+    versions = await cache.get_versions_async([status or ALL_STATUSES])
+    if versions is None:
+        return None
+    return page_key(versions, status, sort_by, order, limit, offset, cursor, q, etag)
+
+
+def relevant_versions(versions: Dict[str, int], status: Optional[str]) -> Dict[str, int]:
+    """Versions a list page depends on: those of its status, or all of them"""
+    key = todo_service.counter_key(status)
+    return {key.value: versions[key.value]} if key else versions
+
+
+def list_etag(db: Session, limit, offset, status, sort_by, order, cursor, q=None) -> str:
+    """
+    ETag of a list page, computed from the status counter versions without
+    reading any todo
+    """
+    versions = relevant_versions(counter_service.get_versions(db), status)
+    return page_etag(versions, limit, offset, status, sort_by, order, cursor, q)
+
+
+async def list_etag_async(db: AsyncSession, limit, offset, status, sort_by, order, cursor, q=None) -> str:
+    """Async variant of list_etag, reading through todo_repository"""
+    versions = relevant_versions(await todo_repository.get_versions(db), status)
+    return page_etag(versions, limit, offset, status, sort_by, order, cursor, q)
+
+
+def get_todo(db: Session, todo_id: int) -> Optional[Tuple[str, str]]:
+    """
+    Get a todo by ID, from the cache when possible
+    
+    Args:
+        db: Database session
+        todo_id: Todo ID
+        
+    Returns:
+        Tuple of (JSON encoded todo, ETag) or None if not found
+    """
+    key = todo_key(todo_id)
+    # The stamp is read before the database so that a todo selected before a
+    # concurrent mutation is not stored once the mutation invalidated it
+    cached, stamp = cache.get_stamped(key)
+    if cached is not None:
+        return decode_entry(cached)
+
+    todo = todo_service.get_todo(db, todo_id)
+    if not todo:
+        return None
+    entry = encode_entry(todo)
+    cache.set_unless_invalidated(key, entry, stamp)
+    return decode_entry(entry)
+
+
+def get_todos(
+    db: Session,
+    limit: int,
+    offset: int,
+    status: Optional[str] = None,
+    sort_by: str = "createdAt",
+    order: str = "desc",
+    cursor: Optional[str] = None,
+    q: Optional[str] = None,
+    etag: Optional[str] = None
+) -> Optional[str]:
+    """
+    Get a page of todos, from the cache when possible
+    
+    Pages are keyed by the version of the status they are filtered on (or of
+    all todos), so any mutation touching that status makes them unreachable.
+    
+    Args:
+        db: Database session
+        limit: Maximum number of items to return
+        offset: Number of items to skip
+        status: Filter by status (optional)
+        sort_by: Field to sort by (createdAt, updatedAt, or relevance with q)
+        order: Sort order (asc or desc)
+        cursor: Opaque cursor returned by a previous call (optional)
+        q: Full-text search over title and description (optional)
+        etag: ETag the page is served with; pages are cached per ETag so a
+            page cached before a mutation is never served with a later ETag
+        
+    Returns:
+        JSON encoded page or None if it is empty
+        
+    Raises:
+        ValueError: If the cursor or the sort is invalid
+    """
+    key = list_key(limit, offset, status, sort_by, order, cursor, q, etag)
+    cached = cache.get(key) if key is not None else None
+    if cached is not None:
+        return cached or None
+
+    total, todos, next_cursor = todo_service.get_todos(
+        db, limit, offset, status, sort_by, order, cursor, q
+    )
+    # Empty pages are cached as an empty string
+    body = encode_page(total, limit, 0 if cursor else offset, todos, next_cursor) if todos else ""
+    if key is not None:
+        cache.set(key, body)
+    return body or None
+
+
+async def get_todo_async(db: AsyncSession, todo_id: int) -> Optional[Tuple[str, str]]:
+    """Async variant of get_todo, reading through todo_repository"""
+    key = todo_key(todo_id)
+    cached, stamp = await cache.get_stamped_async(key)
+    if cached is not None:
+        return decode_entry(cached)
+
+    todo = await todo_repository.get_todo(db, todo_id)
+    if not todo:
+        return None
+    entry = encode_entry(todo)
+    await cache.set_unless_invalidated_async(key, entry, stamp)
+    return decode_entry(entry)
+
+
+async def get_todos_async(
+    db: AsyncSession,
+    limit: int,
+    offset: int,
+    status: Optional[str] = None,
+    sort_by: str = "createdAt",
+    order: str = "desc",
+    cursor: Optional[str] = None,
+    q: Optional[str] = None,
+    etag: Optional[str] = None
+) -> Optional[str]:
+    """Async variant of get_todos, reading through todo_repository"""
+    key = await list_key_async(limit, offset, status, sort_by, order, cursor, q, etag)
+    cached = await cache.get_async(key) if key is not None else None
+    if cached is not None:
+        return cached or None
+
+    total, todos, next_cursor = await todo_repository.get_todos(
+        db, limit, offset, status, sort_by, order, cursor, q
+    )
+    body = encode_page(total, limit, 0 if cursor else offset, todos, next_cursor) if todos else ""
+    if key is not None:
+        await cache.set_async(key, body)
+    return body or None
@@ -0,0 +1,266 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.sql import Select, Update
+from app.models.todo import Todo, TodoCounter, TodoStatusEnum
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def increment_statement(status: Optional[TodoStatusEnum], delta: int = 1) -> Optional[Update]:
+    """
+    Build the UPDATE adjusting the counter of a status and bumping its version
+    
+    Args:
+        status: Status whose counter changes (todos without status are not counted)
+        delta: Amount to add (negative to subtract)
+        
+    Returns:
+        UPDATE statement, or None if there is nothing to count
+    """
+    if status is None:
+        return None
+    return (
+        update(TodoCounter)
+        .where(TodoCounter.status == TodoStatusEnum(status))
+        .values(count=TodoCounter.count + delta, version=TodoCounter.version + 1)
+    )
+
+
+def transition_statements(
+    old: Optional[TodoStatusEnum],
+    new: Optional[TodoStatusEnum]
+) -> List[Update]:
+    """
+    Build the UPDATEs moving one todo from one status counter to another
+    
+    Args:
+        old: Previous status
+        new: New status
+        
+    Returns:
+        List of UPDATE statements, empty if the status does not change
+    """
+    old = TodoStatusEnum(old) if old is not None else None
+    new = TodoStatusEnum(new) if new is not None else None
+    if old == new:
+        return []
+    statements = [increment_statement(old, -1), increment_statement(new, 1)]
+    return [stmt for stmt in statements if stmt is not None]
+
+
+def move_statement(todo_id: int, new: TodoStatusEnum) -> Update:
+    """
+    Build the UPDATE moving a todo to a new status counter, given only its id
+    
+    The todo's current status is read, and its row locked, by a subquery, so
+    this must run before the todo itself is updated. The statement returns
+    the statuses whose counters changed: none when the status stays the same
+    or the todo does not exist, otherwise the old and the new one.
+    
+    Args:
+        todo_id: Todo ID
+        new: Status the todo is moved to
+        
+    Returns:
+        UPDATE ... RETURNING statement
+    """
+    new = TodoStatusEnum(new)
+    current = select(Todo.status).where(Todo.id == todo_id).with_for_update().scalar_subquery()
+    return (
+        update(TodoCounter)
+        .where(TodoCounter.status.in_([new, current]), current != new)
+        .values(
+            count=TodoCounter.count + case((TodoCounter.status == new, 1), else_=-1),
+            version=TodoCounter.version + 1,
+        )
+        .returning(TodoCounter.status)
+    )
+
+
+def previous_status(changed: Iterable[TodoStatusEnum], new: TodoStatusEnum) -> Optional[TodoStatusEnum]:
+    """Old status of a todo, from the statuses returned by move_statement"""
+    return next((status for status in changed if status != new), None)
+
+
+def status_order(status: Optional[TodoStatusEnum]) -> int:
+    """Rank of a status in the order counter rows are locked in"""
+    return -1 if status is None else list(TodoStatusEnum).index(TodoStatusEnum(status))
+
+
+def delta_statements(deltas: Dict[TodoStatusEnum, int]) -> List[Update]:
+    """
+    Build the UPDATEs applying several counter changes at once
+    
+    Statuses with a delta of 0 only have their version bumped, since their
+    todos were still modified. The statements follow the declaration order of
+    the statuses, whatever the order of deltas, so that concurrent batches
+    lock the counter rows in the same order and cannot deadlock.
+    
+    Args:
+        deltas: Amount to add per status
+        
+    Returns:
+        List of UPDATE statements, one per status in deltas
+    """
+    statements = [
+        increment_statement(status, deltas[status])
+        for status in sorted(deltas, key=status_order)
+    ]
+    return [stmt for stmt in statements if stmt is not None]
+
+
+def touch_statement(statuses: Iterable[Optional[TodoStatusEnum]]) -> Optional[Update]:
+    """
+    Build the UPDATE bumping the version of statuses whose todos were
+    modified without changing their counts
+    
+    Args:
+        statuses: Statuses of the modified todos
+        
+    Returns:
+        UPDATE statement, or None if there is nothing to bump
+    """
+    statuses = {TodoStatusEnum(status) for status in statuses if status is not None}
+    if not statuses:
+        return None
+    return (
+        update(TodoCounter)
+        .where(TodoCounter.status.in_(statuses))
+        .values(version=TodoCounter.version + 1)
+    )
+
+
+def counts_statement() -> Select:
+    """Build the SELECT reading every counter"""
+    return select(TodoCounter.status, TodoCounter.count)
+
+
+def counts_from_rows(rows: Iterable[Tuple[TodoStatusEnum, int]]) -> Dict[TodoStatusEnum, int]:
+    """Turn counter rows into a mapping with every status present"""
+    counts = {status: 0 for status in TodoStatusEnum}
+    for status, count in rows:
+        counts[status] = count
+    return counts
+
+
+def versions_statement() -> Select:
+    """Build the SELECT reading the version of every counter"""
+    return select(TodoCounter.status, TodoCounter.version)
+
+
+def versions_from_rows(rows: Iterable[Tuple[TodoStatusEnum, int]]) -> Dict[str, int]:
+    """Turn version rows into a mapping of status value to version"""
+    versions = {status.value: 0 for status in TodoStatusEnum}
+    for status, version in rows:
+        versions[status.value] = version
+    return versions
+
+
+def increment(db: Session, status: Optional[TodoStatusEnum], delta: int = 1) -> None:
+    """
+    Adjust the counter of a status inside the caller's transaction
+    
+    Args:
+        db: Database session
+        status: Status whose counter changes
+        delta: Amount to add (negative to subtract)
+    """
+    stmt = increment_statement(status, delta)
+    if stmt is not None:
+        db.execute(stmt)
+
+
+def transition(
+    db: Session,
+    old: Optional[TodoStatusEnum],
+    new: Optional[TodoStatusEnum]
+) -> None:
+    """
+    Move one todo from one status counter to another
+    
+    Args:
+        db: Database session
+        old: Previous status
+        new: New status
+    """
+    for stmt in transition_statements(old, new):
+        db.execute(stmt)
+
+
+def touch(db: Session, *statuses: Optional[TodoStatusEnum]) -> None:
+    """
+    Bump the version of statuses inside the caller's transaction
+    
+    Args:
+        db: Database session
+        statuses: Statuses of the modified todos
+    """
+    stmt = touch_statement(statuses)
+    if stmt is not None:
+        db.execute(stmt)
+
+
+def apply_deltas(db: Session, deltas: Dict[TodoStatusEnum, int]) -> None:
+    """
+    Apply several counter changes inside the caller's transaction
+    
+    Args:
+        db: Database session
+        deltas: Amount to add per status
+    """
+    for stmt in delta_statements(deltas):
+        db.execute(stmt)
+
+
+def get_counts(db: Session) -> Dict[TodoStatusEnum, int]:
+    """
+    Get the number of todos per status
+    
+    Args:
+        db: Database session
+        
+    Returns:
+        Mapping of status to count, with every status present
+    """
+    return counts_from_rows(db.execute(counts_statement()))
+
+
+def get_versions(db: Session) -> Dict[str, int]:
+    """
+    Get the version of every status, bumped by each mutation of its todos
+    
+    Args:
+        db: Database session
+        
+    Returns:
+        Mapping of status value to version, with every status present
+    """
+    return versions_from_rows(db.execute(versions_statement()))
+
+
+def rebuild_counters(db: Session) -> None:
+    """
+    Recompute every counter from the todos table and commit
+    
+    Args:
+        db: Database session
+    """
+    actual = dict(db.execute(select(Todo.status, func.count()).group_by(Todo.status)).all())
+    # Versions keep increasing so that no ETag issued before becomes current again
+    versions = get_versions(db)
+    db.execute(delete(TodoCounter))
+    db.execute(insert(TodoCounter), [
+        {"status": status, "count": actual.get(status, 0), "version": versions[status.value] + 1}
+        for status in TodoStatusEnum
+    ])
+    db.commit()
+
+
+def ensure_counters(db: Session) -> None:
+    """
+    Seed the counters from the todos table if they have never been built
+    
+    Args:
+        db: Database session
+    """
+    if db.execute(select(func.count()).select_from(TodoCounter)).scalar() < len(TodoStatusEnum):
+        rebuild_counters(db)
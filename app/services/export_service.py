@@ -0,0 +1,87 @@
+"""
+Streaming export of every todo as NDJSON or CSV.
+
+Rows are read from a server-side cursor and encoded one batch at a time, so
+memory use does not depend on the number of todos.
+"""
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import sessionmaker
+from app.services import todo_service
+from typing import Callable, Iterator, List, Optional
+import csv
+import io
+import json
+
+# Field names as they appear in API responses
+EXPORT_FIELDS = ["id", "title", "description", "status", "created_at", "updated_at"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _values(row: Row) -> list:
+    return [
+        row.id,
+        row.title,
+        row.description,
+        getattr(row.status, "value", row.status),
+        row.created_at.isoformat() if row.created_at else None,
+        row.updated_at.isoformat() if row.updated_at else None,
+    ]
+
+
+def encode_ndjson(rows: List[Row]) -> str:
+    """Encode rows as newline-delimited JSON objects"""
+    return "".join(
+        json.dumps(dict(zip(EXPORT_FIELDS, _values(row))), separators=(",", ":")) + "\n"
+        for row in rows
+    )
+
+
+def encode_csv(rows: List[Row]) -> str:
+    """Encode rows as CSV lines, without header"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(_values(row) for row in rows)
+    return buffer.getvalue()
+
+
+def stream_todos(
+    session_factory: sessionmaker,
+    fmt: str,
+    status: Optional[str] = None,
+    sort_by: str = "createdAt",
+    order: str = "desc",
+    batch_size: int = 1000
+) -> Iterator[bytes]:
+    """
+    Generate the export body chunk by chunk
+    
+    The session is opened here rather than taken from the request, since the
+    body is produced after the endpoint (and its dependencies) have returned.
+    
+    Args:
+        session_factory: Factory of the session reading the todos
+        fmt: Output format (ndjson or csv)
+        status: Filter by status (optional)
+        sort_by: Field to sort by (createdAt or updatedAt)
+        order: Sort order (asc or desc)
+        batch_size: Number of rows per chunk
+        
+    Yields:
+        Encoded chunks of at most batch_size rows
+    """
+    encode: Callable[[List[Row]], str] = encode_ndjson if fmt == "ndjson" else encode_csv
+    if fmt == "csv":
+        yield (",".join(EXPORT_FIELDS) + "\r\n").encode()
+
+    with session_factory() as db:
+        batch = []
+        for row in todo_service.iter_todo_rows(db, status, sort_by, order, batch_size):
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield encode(batch).encode()
+                batch = []
+        if batch:
+            yield encode(batch).encode()
@@ -0,0 +1,259 @@
+"""
+Group commit of the todos created one at a time by concurrent requests.
+
+With GROUP_COMMIT_ENABLED, POST /todos does not write its todo itself. It
+joins the batch being gathered, and the batch is written with one multi-row
+INSERT ... RETURNING and one commit. A batch is written at once when no other
+batch is being written, so a lone request is not delayed. Otherwise it
+gathers the requests arriving meanwhile, until the write in progress ends,
+GROUP_COMMIT_MAX_SIZE todos are queued or GROUP_COMMIT_WINDOW has passed
+since its first todo. Every request still receives its own row. When the
+batch fails to be written, its todos are written again one per transaction,
+so only the requests whose todo cannot be written get an error. The cache
+invalidation and change events follow once the todos are committed, and
+never cause a todo to be written again.
+
+A batch only gathers the requests of one worker process.
+"""
+import asyncio
+import logging
+import threading
+from typing import List, Optional, Tuple
+
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.repositories import todo_repository
+from app.schemas.todo import TodoCreate
+from app.services import todo_service
+
+logger = logging.getLogger(__name__)
+
+
+class PendingTodo:
+    """Todo waiting in a batch, and the outcome of writing it"""
+
+    __slots__ = ("item", "row", "error", "done")
+
+    def __init__(self, item: TodoCreate):
+        self.item = item
+        self.row: Optional[Row] = None
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+    def result(self) -> Row:
+        if self.error is not None:
+            raise self.error
+        return self.row
+
+
+def write_batch(db: Session, batch: List[PendingTodo]) -> None:
+    """
+    Write a batch in one transaction, or todo by todo if that fails, then
+    run the post-commit hooks of the todos written
+    
+    Args:
+        db: Database session
+        batch: Pending todos, whose row or error is set
+    """
+    written = False
+    if len(batch) > 1:
+        try:
+            rows = todo_service.insert_todos(db, [pending.item for pending in batch])
+        except Exception:
+            db.rollback()
+        else:
+            for pending, row in zip(batch, rows):
+                pending.row = row
+            written = True
+    if not written:
+        for pending in batch:
+            try:
+                pending.row = todo_service.insert_todo(db, pending.item)
+            except Exception as e:
+                db.rollback()
+                pending.error = e
+
+    rows = [pending.row for pending in batch if pending.row is not None]
+    if rows:
+        try:
+            todo_service.created(rows)
+        except Exception:
+            # The todos are committed, their requests succeed
+            logger.warning("Post-commit hooks of %d created todos failed", len(rows), exc_info=True)
+
+
+class CreateBatcher:
+    """
+    Batches the creates of the sync handlers, which run in a threadpool
+    
+    The first request of a batch leads it: it waits as long as the batch
+    gathers todos, then writes it with its own session while the other
+    requests wait for their row.
+    """
+
+    def __init__(self, max_size: int, window: float):
+        self.max_size = max_size
+        self.window = window
+        self._condition = threading.Condition()
+        # Batch accepting todos, None until the next request starts one
+        self._batch: Optional[List[PendingTodo]] = None
+        # Number of batches being written
+        self._writing = 0
+
+    def create(self, db: Session, data: TodoCreate) -> Row:
+        """
+        Create a todo as part of a batch
+        
+        Args:
+            db: Database session of the request, used if it leads the batch
+            data: Todo creation data
+            
+        Returns:
+            Created todo row
+        """
+        pending = PendingTodo(data)
+        with self._condition:
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = []
+            batch.append(pending)
+            if len(batch) >= self.max_size:
+                # Full: later requests start the next batch
+                self._batch = None
+                self._condition.notify_all()
+            if leader:
+                self._condition.wait_for(lambda: len(batch) >= self.max_size or not self._writing, self.window)
+                if self._batch is batch:
+                    self._batch = None
+                self._writing += 1
+
+        if not leader:
+            pending.done.wait()
+            return pending.result()
+        try:
+            write_batch(db, batch)
+        finally:
+            with self._condition:
+                self._writing -= 1
+                self._condition.notify_all()
+            for other in batch:
+                if other.row is None and other.error is None:
+                    other.error = RuntimeError("The batch of this todo was not written")
+                other.done.set()
+        return pending.result()
+
+
+class AsyncCreateBatcher:
+    """
+    Batches the creates of the async handlers
+    
+    Each batch is written by a task of its own, with its own session, so a
+    request that is cancelled does not abandon the others.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, max_size: int, window: float):
+        self.session_factory = session_factory
+        self.max_size = max_size
+        self.window = window
+        self._batch: Optional[List[Tuple[TodoCreate, asyncio.Future]]] = None
+        self._writing = 0
+        # Notified when a batch fills up or a write ends
+        self._changed = asyncio.Condition()
+        self._tasks = set()
+
+    async def create(self, data: TodoCreate) -> Row:
+        """
+        Create a todo as part of a batch
+        
+        Args:
+            data: Todo creation data
+            
+        Returns:
+            Created todo row
+        """
+        if self._batch is None:
+            self._batch = []
+            task = asyncio.create_task(self.write(self._batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        batch = self._batch
+        future = asyncio.get_running_loop().create_future()
+        batch.append((data, future))
+        if len(batch) >= self.max_size:
+            self._batch = None
+            async with self._changed:
+                self._changed.notify_all()
+        return await future
+
+    async def write(self, batch: List[Tuple[TodoCreate, asyncio.Future]]):
+        # Let the requests already waiting in the event loop join the batch
+        await asyncio.sleep(0)
+        async with self._changed:
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait_for(lambda: len(batch) >= self.max_size or not self._writing),
+                    self.window,
+                )
+            except asyncio.TimeoutError:
+                pass
+        if self._batch is batch:
+            self._batch = None
+        self._writing += 1
+
+        outcomes = []
+        try:
+            async with self.session_factory() as db:
+                if len(batch) > 1:
+                    try:
+                        outcomes = await todo_repository.insert_todos(db, [item for item, _ in batch])
+                    except Exception:
+                        await db.rollback()
+                if not outcomes:
+                    for item, _ in batch:
+                        try:
+                            outcomes.append(await todo_repository.insert_todo(db, item))
+                        except Exception as e:
+                            await db.rollback()
+                            outcomes.append(e)
+            rows = [outcome for outcome in outcomes if not isinstance(outcome, Exception)]
+            if rows:
+                try:
+                    await todo_repository.created(rows)
+                except Exception:
+                    logger.warning("Post-commit hooks of %d created todos failed", len(rows), exc_info=True)
+        finally:
+            self._writing -= 1
+            async with self._changed:
+                self._changed.notify_all()
+            outcomes += [RuntimeError("The batch of this todo was not written")] * (len(batch) - len(outcomes))
+            for (_, future), outcome in zip(batch, outcomes):
+                # The request may have been cancelled in the meantime
+                if future.done():
+                    continue
+                if isinstance(outcome, Exception):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+
+
+def build_batcher() -> Optional[CreateBatcher]:
+    """Create the batcher of the sync handlers, None when group commit is off"""
+    if not settings.GROUP_COMMIT_ENABLED:
+        return None
+    return CreateBatcher(settings.GROUP_COMMIT_MAX_SIZE, settings.GROUP_COMMIT_WINDOW)
+
+
+def build_async_batcher() -> Optional[AsyncCreateBatcher]:
+    """Create the batcher of the async handlers, None when group commit is off"""
+    if not settings.GROUP_COMMIT_ENABLED:
+        return None
+    return AsyncCreateBatcher(AsyncSessionLocal, settings.GROUP_COMMIT_MAX_SIZE, settings.GROUP_COMMIT_WINDOW)
+
+
+batcher = build_batcher()
+async_batcher = build_async_batcher()
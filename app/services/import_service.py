@@ -0,0 +1,177 @@
+"""
+Streaming bulk import of todos from NDJSON or CSV.
+
+The body is parsed as it arrives and validated in chunks of
+IMPORT_CHUNK_SIZE rows; each valid chunk is written and committed on its own
+with COPY on PostgreSQL and executemany elsewhere, so memory is bounded by
+the chunk size rather than by the upload.
+"""
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, sessionmaker
+from pydantic import ValidationError
+from app.core import changes
+from app.core.cache import invalidate_todos
+from app.core.config import settings
+from app.models.todo import Todo, TodoStatusEnum
+from app.schemas.todo import TodoCreate
+from app.services import counter_service, search_service
+from datetime import datetime
+from typing import Iterable, Iterator, List, Tuple
+import csv
+import io
+import json
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+class _ChunkReader(io.RawIOBase):
+    """File-like view over an iterator of byte chunks"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def parse_ndjson(text: io.TextIOBase) -> Iterator[Tuple[int, object]]:
+    """Yield (line number, decoded object or error message) for each non-blank line"""
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, f"Invalid JSON: {e}"
+
+
+# CSV columns whose empty cells are empty strings rather than missing values
+KEPT_EMPTY = {"description"}
+
+
+def parse_csv(text: io.TextIOBase) -> Iterator[Tuple[int, object]]:
+    """Yield (line number, row dict) for each record; the first line is the header"""
+    reader = csv.DictReader(text)
+    for row in reader:
+        # Empty cells mean no value, except that an empty description is
+        # kept as "", as it is in NDJSON
+        yield reader.line_num, {
+            key: value for key, value in row.items()
+            if key is not None and (value != "" or key in KEPT_EMPTY)
+        }
+
+
+def copy_row(values: list) -> str:
+    """
+    Encode a row for COPY ... (FORMAT csv)
+    
+    csv.writer writes None and "" alike as an empty field, which COPY reads
+    as NULL. Here every value is quoted, so empty strings stay empty, and
+    None is left as the unquoted empty field COPY reads as NULL.
+    """
+    return ",".join("" if value is None else '"' + str(value).replace('"', '""') + '"' for value in values) + "\n"
+
+
+def write_chunk(db: Session, items: List[TodoCreate]) -> None:
+    """
+    Insert a chunk of validated todos and commit
+    
+    Args:
+        db: Database session
+        items: Validated todo creation data
+    """
+    now = datetime.utcnow()
+    if db.bind.dialect.name == "postgresql":
+        buffer = io.StringIO()
+        for item in items:
+            # COPY writes enum labels, which SQLAlchemy stores as member names
+            buffer.write(copy_row([item.title, item.description, TodoStatusEnum.new.name, now.isoformat(), now.isoformat()]))
+        buffer.seek(0)
+        cursor = db.connection().connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(
+                "COPY todos (title, description, status, created_at, updated_at) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        finally:
+            cursor.close()
+    else:
+        rows = db.execute(insert(Todo.__table__).returning(Todo.id, Todo.title, Todo.description), [
+            {
+                "title": item.title,
+                "description": item.description,
+                "status": TodoStatusEnum.new,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for item in items
+        ]).all()
+        # PostgreSQL indexes the COPY above through its generated search column
+        search_service.index_todos(db, rows, replace=False)
+    counter_service.increment(db, TodoStatusEnum.new, len(items))
+    db.commit()
+    invalidate_todos([], [TodoStatusEnum.new])
+    # One event per chunk rather than per todo; clients reload the list
+    changes.publish(changes.IMPORTED, None, count=len(items))
+
+
+def import_todos(session_factory: sessionmaker, fmt: str, chunks: Iterable[bytes]) -> dict:
+    """
+    Import todos from an NDJSON or CSV byte stream
+    
+    Each chunk of valid rows is committed on its own, so rows imported before
+    a failure stay imported.
+    
+    Args:
+        session_factory: Factory of the session writing the todos
+        fmt: Input format (ndjson or csv)
+        chunks: Body of the upload, as it arrives
+        
+    Returns:
+        Dict with the imported and failed counts and the first
+        IMPORT_MAX_ERRORS errors, by line number
+    """
+    text = io.TextIOWrapper(io.BufferedReader(_ChunkReader(chunks)), encoding="utf-8", newline="")
+    records = parse_ndjson(text) if fmt == "ndjson" else parse_csv(text)
+    imported = failed = 0
+    errors = []
+    batch: List[TodoCreate] = []
+
+    with session_factory() as db:
+        for line_number, record in records:
+            try:
+                if isinstance(record, str):
+                    raise ValueError(record)
+                batch.append(TodoCreate.model_validate(record))
+            except (ValidationError, ValueError) as e:
+                failed += 1
+                if len(errors) < settings.IMPORT_MAX_ERRORS:
+                    message = "; ".join(
+                        f"{'.'.join(map(str, error['loc'])) or 'row'}: {error['msg']}" for error in e.errors()
+                    ) if isinstance(e, ValidationError) else str(e)
+                    errors.append({"line": line_number, "error": message})
+                continue
+            if len(batch) >= settings.IMPORT_CHUNK_SIZE:
+                write_chunk(db, batch)
+                imported += len(batch)
+                batch = []
+        if batch:
+            write_chunk(db, batch)
+            imported += len(batch)
+
+    return {"imported": imported, "failed": failed, "errors": errors}
@@ -0,0 +1,170 @@
+"""
+Full-text search over the title and description of todos.
+
+PostgreSQL keeps a generated tsvector column, todos.search_vector, behind a
+GIN index, so the database maintains it by itself. SQLite copies the todos
+into the FTS5 table todos_fts (rowid = todo id), which the mutations of
+todo_service keep in step through index_todos and unindex_todos. Other
+databases, and SQLite databases created without todos_fts, fall back to a
+LIKE scan.
+"""
+from sqlalchemy import Float, Integer, String, and_, column, delete, false, func, insert, inspect, literal, literal_column, or_, table, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.engine import Connection, Row
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import ColumnElement, Select
+from app.models.todo import Todo
+from typing import Iterable, List, Tuple
+import re
+import weakref
+
+# Text search configuration of the generated column, and of the queries
+SEARCH_CONFIG = "english"
+
+# Weights of the title and description in the rank
+TITLE_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+FTS_TABLE = "todos_fts"
+
+todos_fts = table(FTS_TABLE, column("rowid", Integer), column("title", String), column("description", String))
+
+search_vector = literal_column("todos.search_vector", TSVECTOR)
+
+SEARCH_VECTOR_EXPRESSION = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')"
+)
+
+# Whether each SQLite engine has the FTS table, looked up once per engine
+_fts_tables = weakref.WeakKeyDictionary()
+
+
+def search_terms(q: str) -> List[str]:
+    """Split a search query into the words every result must contain"""
+    return re.findall(r"\w+", q)
+
+
+def fts_available(db: Session) -> bool:
+    """
+    Check whether the database of a session has the FTS5 table
+    
+    Args:
+        db: Database session
+    
+    Returns:
+        True on SQLite databases that have todos_fts
+    """
+    bind = db.get_bind()
+    if bind.dialect.name != "sqlite":
+        return False
+    available = _fts_tables.get(bind)
+    if available is None:
+        available = _fts_tables[bind] = inspect(db.connection()).has_table(FTS_TABLE)
+    return available
+
+
+def apply_search(statement: Select, q: str, dialect: str, fts: bool = False) -> Tuple[Select, ColumnElement]:
+    """
+    Restrict a select of todos to those matching a search query
+    
+    Args:
+        statement: Select over the todos table
+        q: Search query; every word must match, in the title or description
+        dialect: Name of the database dialect
+        fts: Whether the SQLite FTS5 table is available
+    
+    Returns:
+        Tuple of (filtered statement, rank expression, higher is better)
+    """
+    terms = search_terms(q)
+    if not terms:
+        return statement.where(false()), literal(0.0, Float)
+
+    if dialect == "postgresql":
+        query = func.plainto_tsquery(literal_column(f"'{SEARCH_CONFIG}'"), " ".join(terms))
+        rank = func.ts_rank_cd(search_vector, query, type_=Float)
+        return statement.where(search_vector.op("@@")(query)), rank
+
+    if fts:
+        # Quoted terms are matched as plain words rather than FTS5 syntax
+        match = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        # bm25 is lower for better matches
+        rank = -func.bm25(literal_column(FTS_TABLE), TITLE_WEIGHT, DESCRIPTION_WEIGHT, type_=Float)
+        statement = (
+            statement
+            .join(todos_fts, todos_fts.c.rowid == Todo.id)
+            .where(literal_column(FTS_TABLE).op("MATCH")(match))
+        )
+        return statement, rank
+
+    return statement.where(and_(*(
+        or_(Todo.title.icontains(term, autoescape=True), Todo.description.icontains(term, autoescape=True))
+        for term in terms
+    ))), literal(0.0, Float)
+
+
+def index_todos(db: Session, rows: Iterable[Row], replace: bool = True) -> None:
+    """
+    Copy created or edited todos into the FTS5 table, where there is one
+    
+    Args:
+        db: Database session, in the transaction of the mutation
+        rows: Rows with the id, title and description of the todos
+        replace: Whether the todos may already be indexed
+    """
+    if not fts_available(db):
+        return
+    rows = list(rows)
+    if not rows:
+        return
+    if replace:
+        db.execute(delete(todos_fts).where(todos_fts.c.rowid.in_([row.id for row in rows])))
+    db.execute(insert(todos_fts), [
+        {"rowid": row.id, "title": row.title, "description": row.description}
+        for row in rows
+    ])
+
+
+def unindex_todos(db: Session, todo_ids: List[int]) -> None:
+    """
+    Remove deleted todos from the FTS5 table, where there is one
+    
+    Args:
+        db: Database session, in the transaction of the mutation
+        todo_ids: IDs of the deleted todos
+    """
+    if todo_ids and fts_available(db):
+        db.execute(delete(todos_fts).where(todos_fts.c.rowid.in_(todo_ids)))
+
+
+def rebuild_search_index(connection: Connection) -> None:
+    """
+    Create the search index of the todos table if it is missing, and fill it
+    from the todos
+    
+    Used for databases not created by the migrations, such as those of
+    benchmarks; the migrations create the same structures.
+    
+    Args:
+        connection: Connection in a transaction
+    """
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        connection.execute(text(
+            "ALTER TABLE todos ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({SEARCH_VECTOR_EXPRESSION}) STORED"
+        ))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_todos_search_vector ON todos USING gin (search_vector)"
+        ))
+    elif dialect == "sqlite":
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(title, description, tokenize='porter unicode61')"
+        ))
+        connection.execute(delete(todos_fts))
+        connection.execute(text(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description) SELECT id, title, description FROM todos"
+        ))
+        _fts_tables.clear()
@@ -1,12 +1,158 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc
+from sqlalchemy import desc, asc, delete, func, insert, or_, select, tuple_, update
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import Delete, Insert, Select, Update
+from app.core import changes
+from app.core.cache import invalidate_todo, invalidate_todos
+from app.core.config import settings
+from app.core.etag import ANY_VERSION
 from app.models.todo import Todo, TodoStatusEnum
 from app.schemas.todo import TodoCreate, TodoUpdate
+from app.services import counter_service, search_service
 from datetime import datetime
-from typing import Optional, Tuple, List
+from collections import Counter
+from typing import Dict, Iterator, Optional, Tuple, List
+import base64
+import json
 
 
-def create_todo(db: Session, data: TodoCreate) -> Todo:
+# Every column of the todos table, as returned by the bulk statements
+TODO_COLUMNS = tuple(Todo.__table__.c)
+
+
+class PreconditionFailed(Exception):
+    """The todo exists but no longer has the version the client expected"""
+
+
+def create_statement(data: TodoCreate) -> Insert:
+    """Build the INSERT ... RETURNING creating a todo"""
+    return (
+        insert(Todo.__table__)
+        .values(title=data.title, description=data.description, status=TodoStatusEnum.new)
+        .returning(*TODO_COLUMNS)
+    )
+
+
+def create_many_statement() -> Insert:
+    """Build the multi-row INSERT ... RETURNING creating todos, returning rows in order"""
+    return insert(Todo.__table__).returning(*TODO_COLUMNS, sort_by_parameter_order=True)
+
+
+def create_parameters(items: List[TodoCreate]) -> List[dict]:
+    """Rows of create_many_statement, one per item"""
+    return [
+        {"title": item.title, "description": item.description, "status": TodoStatusEnum.new}
+        for item in items
+    ]
+
+
+def version_condition(expected: Optional[List[Optional[datetime]]]):
+    """
+    Build the condition a todo must meet for a conditional mutation
+    
+    Args:
+        expected: updated_at values the todo may have, None for no condition,
+            ANY_VERSION when it only has to exist
+        
+    Returns:
+        SQL condition, or None when any existing todo meets it
+    """
+    if expected is None or expected is ANY_VERSION:
+        return None
+    values = [value for value in expected if value is not None]
+    condition = Todo.updated_at.in_(values)
+    if len(values) < len(expected):
+        condition = or_(condition, Todo.updated_at.is_(None))
+    return condition
+
+
+def update_statement(todo_id: int, values: dict, expected: Optional[List[Optional[datetime]]] = None) -> Update:
+    """Build the UPDATE ... RETURNING applying values to a todo and touching updated_at"""
+    stmt = (
+        update(Todo.__table__)
+        .where(Todo.id == todo_id)
+        .values(**values, updated_at=datetime.utcnow())
+        .returning(*TODO_COLUMNS)
+    )
+    condition = version_condition(expected)
+    return stmt if condition is None else stmt.where(condition)
+
+
+def delete_statement(todo_id: int, expected: Optional[List[Optional[datetime]]] = None) -> Delete:
+    """Build the DELETE ... RETURNING removing a todo"""
+    stmt = delete(Todo.__table__).where(Todo.id == todo_id).returning(Todo.id, Todo.status)
+    condition = version_condition(expected)
+    return stmt if condition is None else stmt.where(condition)
+
+
+def exists_statement(todo_id: int) -> Select:
+    """Build the SELECT telling whether a todo exists"""
+    return select(Todo.id).where(Todo.id == todo_id)
+
+
+SORT_COLUMNS = {
+    "createdAt": Todo.created_at,
+    "updatedAt": Todo.updated_at,
+}
+
+# Sort of search results by rank, which has no cursor
+RELEVANCE = "relevance"
+
+# Columns copied into the search index
+SEARCH_FIELDS = {"title", "description"}
+
+
+def encode_cursor(sort_by: str, order: str, todo: Row) -> str:
+    """
+    Build an opaque cursor pointing just after the given todo
+    
+    Args:
+        sort_by: Field the page is sorted by (createdAt or updatedAt)
+        order: Sort order (asc or desc)
+        todo: Last todo of the current page
+        
+    Returns:
+        URL-safe cursor string
+    """
+    value = getattr(todo, SORT_COLUMNS[sort_by].key)
+    payload = {
+        "s": sort_by,
+        "o": order,
+        "v": value.isoformat() if value is not None else None,
+        "id": todo.id,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, order: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor produced by encode_cursor
+    
+    Args:
+        cursor: Cursor string received from the client
+        sort_by: Field the page is sorted by
+        order: Sort order
+        
+    Returns:
+        Tuple of (sort column value, todo id)
+        
+    Raises:
+        ValueError: If the cursor is malformed or was issued for another sort
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = datetime.fromisoformat(payload["v"])
+        todo_id = int(payload["id"])
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+    if payload.get("s") != sort_by or payload.get("o") != order:
+        raise ValueError("Cursor does not match the requested sort order")
+    return value, todo_id
+
+
+def create_todo(db: Session, data: TodoCreate) -> Row:
     """
     Create a new todo item in the database
     
@@ -15,62 +161,231 @@ def create_todo(db: Session, data: TodoCreate) -> Todo:
         data: Todo creation data
         
     Returns:
-        Created todo object
+        Created todo row
     """
-    todo = Todo(
-        title=data.title, 
-        description=data.description,
-        status=TodoStatusEnum.new  # Explicitly set default status
-    )
-    db.add(todo)
+    todo = insert_todo(db, data)
+    created([todo])
+    return todo
+
+
+def insert_todo(db: Session, data: TodoCreate) -> Row:
+    """Write and commit a new todo, leaving the post-commit hooks to the caller"""
+    todo = db.execute(create_statement(data)).one()
+    search_service.index_todos(db, [todo], replace=False)
+    counter_service.increment(db, TodoStatusEnum.new)
     db.commit()
-    db.refresh(todo)
     return todo
 
 
+def created(rows: List[Row]) -> None:
+    """Post-commit hooks of created todos: invalidate cached lists and publish the changes"""
+    invalidate_todos([], [TodoStatusEnum.new])
+    changes.publish_rows(changes.CREATED, rows)
+
+
+def estimate_count(db: Session, statement: Select) -> int:
+    """
+    Estimate the number of rows a query returns from the planner statistics
+    
+    Only PostgreSQL exposes a usable estimate; other databases get an exact count.
+    
+    Args:
+        db: Database session
+        statement: SELECT to estimate
+        
+    Returns:
+        Estimated (or exact) row count
+    """
+    if db.bind.dialect.name != "postgresql":
+        return db.execute(select(func.count()).select_from(statement.subquery())).scalar()
+    compiled = statement.compile(dialect=db.bind.dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    plan = db.connection().exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def counter_key(status: Optional[str]):
+    """
+    Find the status counter answering a status filter
+    
+    Args:
+        status: Status filter (optional)
+        
+    Returns:
+        The status, None when every counter is needed, or False when the
+        counters cannot answer the filter
+    """
+    try:
+        return TodoStatusEnum(status) if status else None
+    except ValueError:
+        return False
+
+
+def default_sort(q: Optional[str]) -> str:
+    """Sort of a list request that names none: best matches first when searching"""
+    return RELEVANCE if q is not None else "createdAt"
+
+
+def check_sort(sort_by: str, cursor: Optional[str], q: Optional[str]) -> None:
+    """
+    Reject sorts by relevance that cannot be served
+    
+    Args:
+        sort_by: Field to sort by
+        cursor: Cursor of the request (optional)
+        q: Search query of the request (optional)
+        
+    Raises:
+        ValueError: If relevance is requested without a search or with a cursor
+    """
+    if sort_by != RELEVANCE:
+        return
+    if q is None:
+        raise ValueError("Sorting by relevance requires a search query (q)")
+    if cursor:
+        raise ValueError("Cursors are not supported when sorting by relevance")
+
+
+def count_todos(db: Session, statement: Select, status: Optional[str] = None, q: Optional[str] = None) -> int:
+    """
+    Get the total for a list query
+    
+    Unfiltered and status-filtered queries are answered from the status
+    counters. Anything else, searches included, is counted, or estimated
+    when LIST_TOTAL_ESTIMATE is enabled.
+    
+    Args:
+        db: Database session
+        statement: Filtered select statement
+        status: Status filter applied to the statement (optional)
+        q: Search query applied to the statement (optional)
+        
+    Returns:
+        Total number of matching todos
+    """
+    key = counter_key(status) if q is None else False
+    if key is not False:
+        counts = counter_service.get_counts(db)
+        return counts[key] if key else sum(counts.values())
+    if settings.LIST_TOTAL_ESTIMATE:
+        return estimate_count(db, statement)
+    return db.scalar(select(func.count()).select_from(statement.subquery()))
+
+
 def get_todos(
     db: Session, 
     limit: int, 
     offset: int, 
     status: Optional[str] = None,
     sort_by: str = "createdAt", 
-    order: str = "desc"
-) -> Tuple[int, List[Todo]]:
+    order: str = "desc",
+    cursor: Optional[str] = None,
+    q: Optional[str] = None
+) -> Tuple[int, List[Row], Optional[str]]:
     """
-    Get todos with filtering, sorting and pagination
+    Get todos with filtering, searching, sorting and pagination
+    
+    Pages are ordered by (sort column, id) so that they are stable. When a
+    cursor is given it takes precedence over offset and the page starts
+    right after the todo the cursor points to (keyset pagination). Search
+    results sorted by relevance are paginated by offset only. Todos are
+    returned as plain rows, without building ORM instances.
     
     Args:
         db: Database session
         limit: Maximum number of items to return
         offset: Number of items to skip
         status: Filter by status (optional)
-        sort_by: Field to sort by (createdAt or updatedAt)
+        sort_by: Field to sort by (createdAt, updatedAt, or relevance with q)
         order: Sort order (asc or desc)
+        cursor: Opaque cursor returned by a previous call (optional)
+        q: Full-text search over title and description (optional)
         
     Returns:
-        Tuple of (total count, list of todos)
+        Tuple of (total count, list of todo rows, cursor for the next page or None)
+        
+    Raises:
+        ValueError: If the cursor is invalid, or relevance is requested
+            without a search or with a cursor
     """
-    query = db.query(Todo)
+    check_sort(sort_by, cursor, q)
+    stmt = select(*TODO_COLUMNS)
     
     # Apply status filter if provided
     if status:
-        query = query.filter(Todo.status == status)
+        stmt = stmt.where(Todo.status == status)
+
+    # Apply the search, ranking the matches
+    if q is not None:
+        stmt, rank = search_service.apply_search(
+            stmt, q, db.bind.dialect.name, search_service.fts_available(db)
+        )
 
     # Get total count before pagination
-    total = query.count()
+    total = count_todos(db, stmt, status, q)
 
-    # Apply sorting
+    # Apply sorting, using id as tie-breaker
     order_func = desc if order == "desc" else asc
     # Handle camelCase to snake_case conversion for sorting
-    sort_column = Todo.created_at if sort_by == "createdAt" else Todo.updated_at
-    query = query.order_by(order_func(sort_column))
+    sort_column = rank if sort_by == RELEVANCE else SORT_COLUMNS[sort_by]
+    stmt = stmt.order_by(order_func(sort_column), order_func(Todo.id))
+
+    # Apply pagination, fetching one extra row to know if there is a next page
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_by, order)
+        key = tuple_(sort_column, Todo.id)
+        stmt = stmt.where(key < (value, last_id) if order == "desc" else key > (value, last_id))
+    else:
+        stmt = stmt.offset(offset)
+    todos = db.execute(stmt.limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(todos) > limit:
+        todos = todos[:limit]
+        if sort_by != RELEVANCE:
+            next_cursor = encode_cursor(sort_by, order, todos[-1])
+    return total, todos, next_cursor
+
 
-    # Apply pagination
-    todos = query.offset(offset).limit(limit).all()
-    return total, todos
+def iter_todo_rows(
+    db: Session,
+    status: Optional[str] = None,
+    sort_by: str = "createdAt",
+    order: str = "desc",
+    batch_size: int = 1000
+) -> Iterator[Row]:
+    """
+    Iterate over every todo as plain rows, without loading them all
+    
+    Rows come from a server-side cursor (where the driver supports one) in
+    batches of batch_size and never enter the session's identity map.
+    
+    Args:
+        db: Database session
+        status: Filter by status (optional)
+        sort_by: Field to sort by (createdAt or updatedAt)
+        order: Sort order (asc or desc)
+        batch_size: Number of rows fetched per round trip
+        
+    Yields:
+        Todo rows
+    """
+    order_func = desc if order == "desc" else asc
+    stmt = select(*TODO_COLUMNS).order_by(order_func(SORT_COLUMNS[sort_by]), order_func(Todo.id))
+    if status:
+        stmt = stmt.where(Todo.status == status)
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+    for partition in result.partitions():
+        yield from partition
 
 
-def get_todo(db: Session, todo_id: int) -> Optional[Todo]:
+def get_todo(db: Session, todo_id: int) -> Optional[Row]:
     """
     Get a todo by ID
     
@@ -79,78 +394,253 @@ def get_todo(db: Session, todo_id: int) -> Optional[Todo]:
         todo_id: Todo ID
         
     Returns:
-        Todo object or None if not found
+        Todo row or None if not found
     """
-    return db.query(Todo).filter(Todo.id == todo_id).first()
+    return db.execute(select(*TODO_COLUMNS).where(Todo.id == todo_id)).first()
 
 
-def update_todo(db: Session, todo_id: int, update_data: TodoUpdate) -> Optional[Todo]:
+def check_missing(db: Session, todo_id: int, expected: Optional[list]) -> None:
     """
-    Update a todo
+    Tell a conditional mutation that matched no todo apart from a missing todo
+    
+    Args:
+        db: Database session, after the rollback of the mutation
+        todo_id: Todo ID
+        expected: Condition of the mutation
+        
+    Raises:
+        PreconditionFailed: If the todo exists but did not meet the condition,
+            or is missing while If-Match: * required it to exist
+    """
+    if expected is ANY_VERSION:
+        raise PreconditionFailed(f"Todo {todo_id} does not exist")
+    if expected is not None and db.scalar(exists_statement(todo_id)) is not None:
+        raise PreconditionFailed(f"Todo {todo_id} has been modified")
+
+
+def get_todo_updated_at(db: Session, todo_id: int) -> Tuple[bool, Optional[datetime]]:
+    """
+    Read only the updated_at of a todo, from which its ETag is derived
     
     Args:
         db: Database session
         todo_id: Todo ID
-        update_data: Data to update
         
     Returns:
-        Updated todo or None if not found
+        Tuple of (whether the todo exists, its updated_at)
     """
-    todo = db.query(Todo).filter(Todo.id == todo_id).first()
-    if not todo:
-        return None
+    row = db.execute(select(Todo.updated_at).where(Todo.id == todo_id)).first()
+    return (row is not None, row.updated_at if row is not None else None)
+
+
+def update_todo(
+    db: Session,
+    todo_id: int,
+    update_data: TodoUpdate,
+    expected: Optional[List[Optional[datetime]]] = None
+) -> Optional[Row]:
+    """
+    Update a todo with a single UPDATE ... RETURNING
     
+    Args:
+        db: Database session
+        todo_id: Todo ID
+        update_data: Data to update
+        expected: updated_at values the todo must have, from If-Match (optional)
+        
+    Returns:
+        Updated todo row or None if not found
+        
+    Raises:
+        PreconditionFailed: If the todo does not have an expected updated_at
+    """
     # Extract values, handling potential Enum conversions
     update_dict = update_data.model_dump(exclude_unset=True)
+    if "status" in update_dict:
+        update_dict["status"] = TodoStatusEnum(update_dict["status"])
+        return update_status(db, todo_id, update_dict.pop("status"), expected, **update_dict)
     
-    # Apply updates to model
-    for key, value in update_dict.items():
-        setattr(todo, key, value)
-    
-    # Update the updated_at timestamp
-    todo.updated_at = datetime.utcnow()
+    todo = db.execute(update_statement(todo_id, update_dict, expected)).one_or_none()
+    if not todo:
+        db.rollback()
+        check_missing(db, todo_id, expected)
+        return None
+    if SEARCH_FIELDS & update_dict.keys():
+        search_service.index_todos(db, [todo])
+    counter_service.touch(db, todo.status)
     db.commit()
-    db.refresh(todo)
+    invalidate_todo(todo_id, todo.status)
+    changes.publish(changes.UPDATED, todo_id, todo)
     return todo
 
 
-def update_status(db: Session, todo_id: int, status: TodoStatusEnum) -> Optional[Todo]:
+def update_status(
+    db: Session,
+    todo_id: int,
+    status: TodoStatusEnum,
+    expected: Optional[List[Optional[datetime]]] = None,
+    **values
+) -> Optional[Row]:
     """
-    Update todo status
+    Update todo status, and optionally other fields
+    
+    The status counters are moved first since that statement reads the
+    current status and locks the todo; the todo is then updated with a
+    single UPDATE ... RETURNING.
     
     Args:
         db: Database session
         todo_id: Todo ID
         status: New status
+        expected: updated_at values the todo must have, from If-Match (optional)
+        values: Other columns to update
         
     Returns:
-        Updated todo or None if not found
+        Updated todo row or None if not found
+        
+    Raises:
+        PreconditionFailed: If the todo does not have an expected updated_at
     """
-    todo = db.query(Todo).filter(Todo.id == todo_id).first()
+    changed = db.scalars(counter_service.move_statement(todo_id, status)).all()
+    todo = db.execute(update_statement(todo_id, {**values, "status": status}, expected)).one_or_none()
     if not todo:
+        db.rollback()
+        check_missing(db, todo_id, expected)
         return None
-    
-    todo.status = status
-    todo.updated_at = datetime.utcnow()
+    if SEARCH_FIELDS & values.keys():
+        search_service.index_todos(db, [todo])
+    if not changed:
+        counter_service.touch(db, status)
     db.commit()
-    db.refresh(todo)
+    invalidate_todo(todo_id, counter_service.previous_status(changed, status), status)
+    changes.publish(changes.STATUS, todo_id, todo)
     return todo
 
 
-def delete_todo(db: Session, todo_id: int) -> bool:
+def delete_todo(db: Session, todo_id: int, expected: Optional[List[Optional[datetime]]] = None) -> bool:
     """
-    Delete a todo
+    Delete a todo with a single DELETE ... RETURNING
     
     Args:
         db: Database session
         todo_id: Todo ID
+        expected: updated_at values the todo must have, from If-Match (optional)
         
     Returns:
         True if deleted, False if not found
+        
+    Raises:
+        PreconditionFailed: If the todo does not have an expected updated_at
     """
-    todo = db.query(Todo).filter(Todo.id == todo_id).first()
-    if not todo:
+    deleted = db.execute(delete_statement(todo_id, expected)).one_or_none()
+    if not deleted:
+        db.rollback()
+        check_missing(db, todo_id, expected)
         return False
-    db.delete(todo)
+    search_service.unindex_todos(db, [todo_id])
+    counter_service.increment(db, deleted.status, -1)
+    db.commit()
+    invalidate_todo(todo_id, deleted.status)
+    changes.publish(changes.DELETED, todo_id)
+    return True
+
+
+def create_todos(db: Session, items: List[TodoCreate]) -> List[Row]:
+    """
+    Create several todos with one multi-row INSERT ... RETURNING
+    
+    Args:
+        db: Database session
+        items: Todo creation data
+        
+    Returns:
+        Created rows, in the order of items
+    """
+    if not items:
+        return []
+    rows = insert_todos(db, items)
+    created(rows)
+    return rows
+
+
+def insert_todos(db: Session, items: List[TodoCreate]) -> List[Row]:
+    """Write and commit several new todos, leaving the post-commit hooks to the caller"""
+    rows = db.execute(create_many_statement(), create_parameters(items)).all()
+    search_service.index_todos(db, rows, replace=False)
+    counter_service.increment(db, TodoStatusEnum.new, len(rows))
+    db.commit()
+    return rows
+
+
+def update_status_many(db: Session, todo_ids: List[int], status: TodoStatusEnum) -> Dict[int, Row]:
+    """
+    Set the status of several todos in one transaction
+    
+    Args:
+        db: Database session
+        todo_ids: Todo IDs
+        status: New status
+        
+    Returns:
+        Updated rows by todo ID; missing todos are absent
+    """
+    # Lock the rows and remember their status to keep the counters exact.
+    # Rows are locked in id order so that overlapping batches cannot deadlock.
+    previous = dict(db.execute(
+        select(Todo.id, Todo.status).where(Todo.id.in_(set(todo_ids))).order_by(Todo.id).with_for_update()
+    ).all())
+    if not previous:
+        db.rollback()
+        return {}
+
+    rows = db.execute(
+        update(Todo.__table__)
+        .where(Todo.id.in_(list(previous)))
+        .values(status=status, updated_at=datetime.utcnow())
+        .returning(*TODO_COLUMNS)
+    ).all()
+    deltas = Counter()
+    for old_status in previous.values():
+        deltas[old_status] -= 1
+        deltas[status] += 1
+    counter_service.apply_deltas(db, deltas)
+    db.commit()
+    invalidate_todos(previous, [*set(previous.values()), status])
+    changes.publish_rows(changes.STATUS, rows)
+    return {row.id: row for row in rows}
+
+
+def delete_todos(db: Session, todo_ids: List[int]) -> List[int]:
+    """
+    Delete several todos with one DELETE ... RETURNING
+    
+    Args:
+        db: Database session
+        todo_ids: Todo IDs
+        
+    Returns:
+        IDs of the deleted todos
+    """
+    # Lock the rows in id order first: the DELETE alone locks them in
+    # whatever order the plan scans them, so overlapping batches could deadlock
+    locked = db.scalars(
+        select(Todo.id).where(Todo.id.in_(set(todo_ids))).order_by(Todo.id).with_for_update()
+    ).all()
+    if not locked:
+        db.rollback()
+        return []
+    rows = db.execute(
+        delete(Todo.__table__)
+        .where(Todo.id.in_(locked))
+        .returning(Todo.id, Todo.status)
+    ).all()
+    deltas = Counter()
+    for row in rows:
+        deltas[row.status] -= 1
+    search_service.unindex_todos(db, [row.id for row in rows])
+    counter_service.apply_deltas(db, deltas)
     db.commit()
-    return True
\ No newline at end of file
+    invalidate_todos([row.id for row in rows], {row.status for row in rows})
+    for row in rows:
+        changes.publish(changes.DELETED, row.id)
+    return [row.id for row in rows]
@@ -0,0 +1,109 @@
+"""
+Throughput of the sync and async request paths against SQLite
+
+Each mode runs in its own process since DATABASE_ASYNC is read at import time.
+The async path uses aiosqlite, the sync path pysqlite on Starlette's threadpool.
+
+Usage:
+    python -m benchmarks.bench_async [--clients 50 200 1000] [--duration 5]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+DB_PATH = "bench_async.db"
+SEED = 1000
+# Requests stuck longer than this count as errors (the sync path can deadlock
+# its threadpool against the connection pool under high concurrency)
+REQUEST_TIMEOUT = 10.0
+
+
+async def drive(app, clients: int, duration: float) -> dict:
+    import httpx
+
+    done = errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client(http):
+        nonlocal done, errors
+        while time.perf_counter() < deadline:
+            if random.random() < 0.5:
+                request = http.get("/api/v1/todos", params={"limit": 20})
+            else:
+                request = http.get(f"/api/v1/todos/{random.randint(1, SEED)}")
+            try:
+                response = await asyncio.wait_for(request, REQUEST_TIMEOUT)
+            except asyncio.TimeoutError:
+                errors += 1
+                continue
+            if response.status_code < 400:
+                done += 1
+            else:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        began = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(clients)))
+        return {"rps": done / (time.perf_counter() - began), "errors": errors}
+
+
+def worker(mode: str, clients: int, duration: float):
+    os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+    os.environ["DATABASE_ASYNC"] = "true" if mode == "async" else "false"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    from app.main import app
+
+    print(json.dumps(asyncio.run(drive(app, clients, duration))), flush=True)
+    # Threads stuck on the connection pool must not keep the process alive
+    os._exit(0)
+
+
+def seed():
+    os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+    from app.db.database import SessionLocal, create_tables
+    from app.schemas.todo import TodoCreate
+    from app.services import todo_service
+
+    create_tables()
+    with SessionLocal() as db:
+        for i in range(SEED):
+            todo_service.create_todo(db, TodoCreate(title=f"todo {i}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--worker", choices=["sync", "async"])
+    args = parser.parse_args()
+
+    if args.worker:
+        return worker(args.worker, args.clients[0], args.duration)
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    subprocess.run([sys.executable, "-c", "from benchmarks.bench_async import seed; seed()"], check=True)
+    # One process per run so a stalled threadpool cannot leak into the next one
+    results = {"sync": {}, "async": {}}
+    for mode in results:
+        for c in args.clients:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_async", "--worker", mode,
+                 "--duration", str(args.duration), "--clients", str(c)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results[mode][c] = json.loads(out.strip().splitlines()[-1])
+    print(f"{'clients':>8} {'sync req/s':>12} {'errors':>7} {'async req/s':>12} {'errors':>7}")
+    for c in args.clients:
+        sync, async_ = results["sync"][c], results["async"][c]
+        print(f"{c:>8} {sync['rps']:>12.1f} {sync['errors']:>7} {async_['rps']:>12.1f} {async_['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
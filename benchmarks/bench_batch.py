@@ -0,0 +1,72 @@
+"""
+Single-item calls vs the batch endpoints for create, status and delete
+
+Usage:
+    python -m benchmarks.bench_batch [--items 10000] [--batch 1000]
+"""
+import argparse
+import os
+import time
+
+DB_PATH = "bench_batch.db"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    from fastapi.testclient import TestClient
+    from app.db.database import create_tables
+    from app.main import app
+
+    create_tables()
+    client = TestClient(app)
+    chunks = lambda seq: [seq[i:i + args.batch] for i in range(0, len(seq), args.batch)]
+    results = []
+
+    began = time.perf_counter()
+    single_ids = [
+        client.post("/api/v1/todos", json={"title": f"single {i}"}).json()["id"]
+        for i in range(args.items)
+    ]
+    single_create = time.perf_counter() - began
+
+    began = time.perf_counter()
+    batch_ids = []
+    for chunk in chunks(list(range(args.items))):
+        response = client.post("/api/v1/todos:batch", json={"items": [{"title": f"batch {i}"} for i in chunk]})
+        batch_ids.extend(item["id"] for item in response.json()["results"])
+    results.append(("create", single_create, time.perf_counter() - began))
+
+    began = time.perf_counter()
+    for todo_id in single_ids:
+        client.post(f"/api/v1/todos/{todo_id}/complete")
+    single = time.perf_counter() - began
+    began = time.perf_counter()
+    for chunk in chunks(batch_ids):
+        client.patch("/api/v1/todos:batch-status", json={"ids": chunk, "status": "completed"})
+    results.append(("status", single, time.perf_counter() - began))
+
+    began = time.perf_counter()
+    for todo_id in single_ids:
+        client.delete(f"/api/v1/todos/{todo_id}")
+    single = time.perf_counter() - began
+    began = time.perf_counter()
+    for chunk in chunks(batch_ids):
+        client.request("DELETE", "/api/v1/todos:batch", json={"ids": chunk})
+    results.append(("delete", single, time.perf_counter() - began))
+
+    print(f"{args.items} items, batches of {args.batch}")
+    print(f"{'operation':>10} {'single items/s':>15} {'batch items/s':>15}")
+    for name, single, batch in results:
+        print(f"{name:>10} {args.items / single:>15.0f} {args.items / batch:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
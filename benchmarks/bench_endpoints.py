@@ -0,0 +1,242 @@
+"""
+Throughput and latency of every route of app/api/v1/routes.py, with
+regression checks against a stored baseline
+
+The app is built with create_app and driven in-process at a fixed
+concurrency, once per seeded table size. The report goes to bench_output.txt.
+The database is SQLite by default. Pass --url (or set BENCH_DATABASE_URL)
+to use PostgreSQL. The todos tables of that database are dropped and
+re-created for every scale.
+
+Usage:
+    python -m benchmarks.bench_endpoints [--scales 1000 10000] [--concurrency 8] [--requests 200]
+    python -m benchmarks.bench_endpoints --save-baseline bench_baseline.json
+    python -m benchmarks.bench_endpoints --baseline bench_baseline.json [--threshold 0.25]
+
+In comparison mode the exit status is 1 when the p95 latency of a route grows,
+or its throughput drops, by more than the threshold relative to the baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple
+
+# Routes whose requests are much heavier than the others run this many times fewer
+HEAVY_DIVISOR = 10
+BATCH = 10
+IMPORT_LINES = 100
+
+# Streaming routes have no request rate to measure
+UNMEASURED = {("GET", "/todos/changes")}
+
+
+class Scenario(NamedTuple):
+    method: str
+    path: str
+    # Requests are sent in phases so that deletes only remove todos created
+    # by the benchmark itself
+    phase: str
+    # Build the URL and request arguments of the i-th request
+    request: Callable[[int, dict], tuple]
+    heavy: bool = False
+
+
+def seeded_id(i: int, ctx: dict) -> int:
+    # Spread requests over the whole table rather than its first rows
+    return 1 + (i * 7919) % ctx["scale"]
+
+
+SCENARIOS = [
+    Scenario("GET", "/todos", "read", lambda i, ctx: (
+        "/api/v1/todos", {"params": {"limit": 20, "offset": (i * 20) % ctx["scale"]}})),
+    Scenario("GET", "/todos/stats", "read", lambda i, ctx: ("/api/v1/todos/stats", {})),
+    Scenario("GET", "/todos/export", "read", lambda i, ctx: (
+        "/api/v1/todos/export", {"params": {"status": "completed"}}), heavy=True),
+    Scenario("GET", "/cache/stats", "read", lambda i, ctx: ("/api/v1/cache/stats", {})),
+    Scenario("GET", "/todos/{todo_id}", "read", lambda i, ctx: (f"/api/v1/todos/{seeded_id(i, ctx)}", {})),
+    Scenario("PUT", "/todos/{todo_id}", "write", lambda i, ctx: (
+        f"/api/v1/todos/{seeded_id(i, ctx)}", {"json": {"title": f"updated {i}"}})),
+    Scenario("PATCH", "/todos/{todo_id}", "write", lambda i, ctx: (
+        f"/api/v1/todos/{seeded_id(i, ctx)}", {"json": {"description": f"patched {i}"}})),
+    Scenario("POST", "/todos/{todo_id}/complete", "write", lambda i, ctx: (
+        f"/api/v1/todos/{seeded_id(i, ctx)}/complete", {})),
+    Scenario("POST", "/todos/{todo_id}/in-progress", "write", lambda i, ctx: (
+        f"/api/v1/todos/{seeded_id(i + 1, ctx)}/in-progress", {})),
+    Scenario("PATCH", "/todos:batch-status", "write", lambda i, ctx: (
+        "/api/v1/todos:batch-status",
+        {"json": {"ids": [seeded_id(i * BATCH + k, ctx) for k in range(BATCH)], "status": "completed"}})),
+    Scenario("POST", "/todos", "create", lambda i, ctx: ("/api/v1/todos", {"json": {"title": f"created {i}"}})),
+    Scenario("POST", "/todos:batch", "create", lambda i, ctx: (
+        "/api/v1/todos:batch", {"json": {"items": [{"title": f"batch {i}.{k}"} for k in range(BATCH)]}})),
+    Scenario("POST", "/todos/import", "create", lambda i, ctx: (
+        "/api/v1/todos/import",
+        {"content": "".join(json.dumps({"title": f"import {i}.{k}"}) + "\n" for k in range(IMPORT_LINES))}),
+        heavy=True),
+    Scenario("DELETE", "/todos/{todo_id}", "delete", lambda i, ctx: (f"/api/v1/todos/{ctx['fresh'][i]}", {})),
+    Scenario("DELETE", "/todos:batch", "delete", lambda i, ctx: (
+        "/api/v1/todos:batch", {"json": {"ids": ctx["fresh"][-(i + 1) * BATCH:][:BATCH]}})),
+]
+
+PHASES = ["read", "write", "create", "delete"]
+
+
+def percentile(quantiles: List[float], p: int) -> float:
+    return quantiles[p - 1]
+
+
+async def run_scenario(http, scenario: Scenario, ctx: dict, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal errors, next_index
+        while next_index < requests:
+            i = next_index
+            next_index += 1
+            url, kwargs = scenario.request(i, ctx)
+            began = time.perf_counter()
+            response = await http.request(scenario.method, url, **kwargs)
+            latencies.append((time.perf_counter() - began) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    began = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - began
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(quantiles, 50),
+        "p95": percentile(quantiles, 95),
+        "p99": percentile(quantiles, 99),
+    }
+
+
+async def run_scale(app, scale: int, requests: int, concurrency: int) -> Dict[str, dict]:
+    import httpx
+    from sqlalchemy import select
+    from app.db.database import SessionLocal
+    from app.models.todo import Todo
+
+    ctx = {"scale": scale}
+    results = {}
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        for phase in PHASES:
+            if phase == "delete":
+                with SessionLocal() as db:
+                    ctx["fresh"] = list(db.scalars(select(Todo.id).where(Todo.id > scale).order_by(Todo.id)))
+            for scenario in SCENARIOS:
+                if scenario.phase != phase:
+                    continue
+                count = max(requests // HEAVY_DIVISOR, 5) if scenario.heavy else requests
+                results[f"{scenario.method} {scenario.path}"] = await run_scenario(
+                    http, scenario, ctx, count, concurrency
+                )
+    return results
+
+
+def check_coverage(router) -> List[str]:
+    """Routes of the router that no scenario drives"""
+    covered = {(scenario.method, scenario.path) for scenario in SCENARIOS} | UNMEASURED
+    return [
+        f"{method} {route.path}"
+        for route in router.routes
+        for method in sorted(getattr(route, "methods", ()))
+        if (method, route.path) not in covered
+    ]
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Describe every route slower than its baseline by more than threshold"""
+    regressions = []
+    for scale, routes in results.items():
+        for route, current in routes.items():
+            previous = baseline.get(scale, {}).get(route)
+            if previous is None:
+                continue
+            if current["p95"] > previous["p95"] * (1 + threshold):
+                regressions.append(
+                    f"{scale:>8} {route}: p95 {previous['p95']:.2f} -> {current['p95']:.2f} ms"
+                )
+            if current["rps"] < previous["rps"] * (1 - threshold):
+                regressions.append(
+                    f"{scale:>8} {route}: throughput {previous['rps']:.1f} -> {current['rps']:.1f} req/s"
+                )
+    return regressions
+
+
+def report(results: dict, args, url: str, regressions: List[str]) -> str:
+    lines = [
+        f"database: {url}",
+        f"concurrency: {args.concurrency}, requests per route: {args.requests}",
+        "",
+        f"{'rows':>8} {'route':<36} {'requests':>8} {'errors':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}",
+    ]
+    for scale, routes in results.items():
+        for route, r in routes.items():
+            lines.append(
+                f"{scale:>8} {route:<36} {r['requests']:>8} {r['errors']:>6} {r['rps']:>9.1f} "
+                f"{r['p50']:>8.2f} {r['p95']:>8.2f} {r['p99']:>8.2f}"
+            )
+    if args.baseline:
+        lines.append("")
+        lines.append(f"baseline: {args.baseline} (threshold {args.threshold:.0%})")
+        lines.extend(regressions or ["no regression"])
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.environ.get("BENCH_DATABASE_URL", "sqlite:///bench_endpoints.db"))
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--output", default="bench_output.txt")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    # Settings are read when the app modules are imported
+    os.environ["DATABASE_URL"] = args.url
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    from sqlalchemy import create_engine
+    from app.api.v1.routes import router
+    from app.main import create_app
+    from benchmarks.bench_pagination import seed
+
+    for route in check_coverage(router):
+        print(f"warning: no scenario for {route}", file=sys.stderr)
+
+    engine = create_engine(args.url)
+    results = {}
+    for scale in args.scales:
+        seed(engine, scale)
+        app = create_app()
+        results[str(scale)] = asyncio.run(run_scale(app, scale, args.requests, args.concurrency))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+
+    output = report(results, args, engine.url.render_as_string(hide_password=True), regressions)
+    with open(args.output, "w") as f:
+        f.write(output)
+    print(output, end="")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Rows/sec and server peak RSS of GET /todos/export on a large table
+
+The app runs under uvicorn in a separate process so its peak RSS (VmHWM,
+Linux only) reflects the export alone.
+
+Usage:
+    python -m benchmarks.bench_export [--rows 1000000] [--format ndjson]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = "bench_export.db"
+PORT = 8765
+
+
+def seed(rows: int):
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import sessionmaker
+    from app.models.todo import Base, Todo, TodoStatusEnum
+    from app.services import counter_service
+
+    engine = create_engine(f"sqlite:///{DB_PATH}")
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2024, 1, 1)
+    statuses = list(TodoStatusEnum)
+    with engine.begin() as conn:
+        for chunk in range(0, rows, 20000):
+            conn.execute(insert(Todo), [
+                {
+                    "title": f"todo {i}",
+                    "description": f"description of todo {i}",
+                    "status": statuses[i % len(statuses)],
+                    "created_at": start + timedelta(seconds=i),
+                    "updated_at": start + timedelta(seconds=i),
+                }
+                for i in range(chunk, min(chunk + 20000, rows))
+            ])
+    with sessionmaker(bind=engine)() as db:
+        counter_service.rebuild_counters(db)
+
+
+def peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    args = parser.parse_args()
+
+    import httpx
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    seed(args.rows)
+
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{DB_PATH}", "RATE_LIMIT_ENABLED": "false"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        base = f"http://127.0.0.1:{PORT}"
+        for _ in range(100):
+            try:
+                httpx.get(f"{base}/health")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        rss_before = peak_rss_mb(server.pid)
+
+        lines = size = 0
+        began = time.perf_counter()
+        with httpx.stream("GET", f"{base}/api/v1/todos/export", params={"format": args.format}, timeout=None) as response:
+            for chunk in response.iter_bytes():
+                lines += chunk.count(b"\n")
+                size += len(chunk)
+        elapsed = time.perf_counter() - began
+        exported = lines - (1 if args.format == "csv" else 0)
+
+        print(f"rows exported:     {exported}")
+        print(f"bytes:             {size}")
+        print(f"elapsed:           {elapsed:.1f}s")
+        print(f"rows/sec:          {exported / elapsed:.0f}")
+        print(f"server peak RSS:   {peak_rss_mb(server.pid):.1f} MB (idle {rss_before:.1f} MB)")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Per-request overhead of the metrics middleware (with and without the
+Server-Timing header), on an endpoint that does nothing and on GET /todos/{id}
+
+Requests are sent straight to the ASGI app, without any HTTP client or
+server in between, so the overhead is not hidden behind transport costs.
+
+Usage:
+    python -m benchmarks.bench_metrics [--requests 20000] [--url sqlite:///bench.db]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+REPEAT = 9
+
+
+async def call(app, path: str):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def per_request_us(apps: dict, path: str, requests: int) -> dict:
+    # Apps take turns so that drift in machine load spreads over all of them
+    samples = {name: [] for name in apps}
+    for _ in range(REPEAT):
+        for name, app in apps.items():
+            began = time.perf_counter()
+            for _ in range(requests):
+                await call(app, path)
+            samples[name].append((time.perf_counter() - began) / requests * 1e6)
+    return {name: statistics.median(values) for name, values in samples.items()}
+
+
+def build_apps():
+    from app.core import config
+
+    config.settings.RATE_LIMIT_ENABLED = False
+    apps = {}
+    for name, enabled, timing in [("off", False, False), ("metrics", True, False), ("+timing", True, True)]:
+        config.settings.METRICS_ENABLED = enabled
+        config.settings.SERVER_TIMING_HEADER = timing
+        from app.main import create_app
+
+        app = create_app()
+
+        @app.get("/noop")
+        async def noop():
+            return None
+
+        apps[name] = app
+    return apps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--url", default="sqlite:///bench_metrics.db")
+    args = parser.parse_args()
+    os.environ["DATABASE_URL"] = args.url
+
+    from app.db.database import SessionLocal, create_tables
+    from app.schemas.todo import TodoCreate
+    from app.services import todo_service
+
+    create_tables()
+    apps = build_apps()
+    with SessionLocal() as db:
+        todo_id = todo_service.create_todo(db, TodoCreate(title="bench")).id
+
+    print(f"{'path':>16} {'off us':>8} {'metrics us':>11} {'+timing us':>11}")
+    for path, requests in [("/noop", args.requests), (f"/api/v1/todos/{todo_id}", args.requests // 10)]:
+        results = asyncio.run(per_request_us(apps, path, requests))
+        label = path if path == "/noop" else "/todos/{id}"
+        print(f"{label:>16} {results['off']:>8.1f} {results['metrics']:>11.1f} {results['+timing']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Page-1000 latency of offset vs keyset (cursor) pagination as the table grows
+
+Usage:
+    python -m benchmarks.bench_pagination [--scales 25000 100000 400000] [--url sqlite:///bench.db]
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.models.todo import Base, Todo, TodoStatusEnum
+from app.services import counter_service, search_service, todo_service
+
+PAGE = 1000
+LIMIT = 20
+REPEAT = 20
+
+
+def seed(engine, rows: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    start = datetime(2024, 1, 1)
+    statuses = list(TodoStatusEnum)
+    with engine.begin() as conn:
+        for chunk in range(0, rows, 10000):
+            conn.execute(insert(Todo), [
+                {
+                    "title": f"todo {i}",
+                    "status": statuses[i % len(statuses)],
+                    "created_at": start + timedelta(seconds=i),
+                    "updated_at": start + timedelta(seconds=i),
+                }
+                for i in range(chunk, min(chunk + 10000, rows))
+            ])
+        search_service.rebuild_search_index(conn)
+    with sessionmaker(bind=engine)() as db:
+        counter_service.rebuild_counters(db)
+
+
+def timed(fn) -> float:
+    samples = []
+    for _ in range(REPEAT):
+        began = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - began) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scales", type=int, nargs="+", default=[25000, 100000, 400000])
+    parser.add_argument("--url", default="sqlite:///bench_pagination.db")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    Session = sessionmaker(bind=engine)
+    offset = (PAGE - 1) * LIMIT
+    print(f"{'rows':>10} {'offset ms':>10} {'cursor ms':>10}")
+    for rows in args.scales:
+        seed(engine, rows)
+        with Session() as db:
+            # Cursor of the last row of page 999, as a client walking pages would hold
+            _, previous, _ = todo_service.get_todos(db, 1, offset - 1)
+            cursor = todo_service.encode_cursor("createdAt", "desc", previous[0])
+            offset_ms = timed(lambda: todo_service.get_todos(db, LIMIT, offset))
+            cursor_ms = timed(lambda: todo_service.get_todos(db, LIMIT, 0, cursor=cursor))
+        print(f"{rows:>10} {offset_ms:>10.2f} {cursor_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Per-request overhead of RateLimitMiddleware with each backend, measured on
+an ASGI app that does nothing, plus the throughput of the token bucket when
+threads contend for its lock
+
+Usage:
+    python -m benchmarks.bench_rate_limit [--requests 20000] [--redis-url redis://localhost:6379/15]
+
+Without --redis-url the redis backend runs against fakeredis when it is
+installed, which shows the cost of the client but not of a network round trip.
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+from app.core.rate_limit import RateLimitMiddleware, RedisSlidingWindowLimiter, TokenBucketLimiter
+
+REPEAT = 7
+CLIENTS = 100
+
+
+async def noop(scope, receive, send):
+    await send({"type": "http.response.start", "status": 204, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def per_request_us(app, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    scopes = [
+        {"type": "http", "method": "GET", "path": "/api/v1/todos", "client": (f"10.0.0.{i}", 1)}
+        for i in range(CLIENTS)
+    ]
+    samples = []
+    for _ in range(REPEAT):
+        began = time.perf_counter()
+        for i in range(requests):
+            await app(scopes[i % CLIENTS], receive, send)
+        samples.append((time.perf_counter() - began) / requests * 1e6)
+    return statistics.median(samples)
+
+
+def contended_checks_per_second(threads: int, checks: int) -> float:
+    limiter = TokenBucketLimiter(10 ** 9, 1)
+
+    def work(index: int):
+        for _ in range(checks):
+            limiter.check(f"client-{index % 4}")
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    began = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return threads * checks / (time.perf_counter() - began)
+
+
+def redis_client(url):
+    if url:
+        import redis.asyncio
+
+        return redis.asyncio.Redis.from_url(url), "redis"
+    try:
+        import fakeredis
+    except ImportError:
+        return None, None
+    return fakeredis.FakeAsyncRedis(), "redis (fakeredis)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    # Limits high enough that every request is let through
+    limit, period = 10 ** 9, 60
+    apps = {
+        "none": noop,
+        "memory": RateLimitMiddleware(noop, TokenBucketLimiter(limit, period)),
+    }
+    client, label = redis_client(args.redis_url)
+    if client is not None:
+        apps[label] = RateLimitMiddleware(noop, RedisSlidingWindowLimiter(client, limit, period))
+
+    print(f"{'backend':>18} {'us/request':>11} {'overhead us':>12}")
+    baseline = None
+    for name, app in apps.items():
+        requests = args.requests if name != label else args.requests // 10
+        us = asyncio.run(per_request_us(app, requests))
+        baseline = us if baseline is None else baseline
+        print(f"{name:>18} {us:>11.2f} {us - baseline:>12.2f}")
+
+    print()
+    print(f"{'threads':>8} {'checks/s':>12}")
+    for threads in (1, 4, 16):
+        print(f"{threads:>8} {contended_checks_per_second(threads, 50000):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
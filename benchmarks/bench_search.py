@@ -0,0 +1,114 @@
+"""
+Latency of the indexed full-text search against a LIKE '%term%' scan of
+title and description, for rare and common terms
+
+Each query fetches the first page of 20 results, best matches first for the
+search and newest first for the scan, along with the total count. LIKE
+also matches terms inside longer words, so it may count more rows.
+
+Usage:
+    python -m benchmarks.bench_search [--rows 1000000] [--url sqlite:///bench_search.db]
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, desc, func, insert, or_, select
+from sqlalchemy.orm import sessionmaker
+
+from app.models.todo import Base, Todo, TodoStatusEnum
+from app.services import search_service
+from app.services.todo_service import TODO_COLUMNS
+
+LIMIT = 20
+REPEAT = 5
+CHUNK = 10000
+
+# Word frequencies follow a Zipf-like curve, so the first words are common
+# and the last ones rare
+VOCABULARY = [f"word{i}" for i in range(5000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+QUERIES = {
+    "common": "word1",
+    "rare": "word4000",
+    "two terms": "word2 word30",
+}
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(VOCABULARY, WEIGHTS, k=words))
+
+
+def seed(engine, rows: int):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    statuses = list(TodoStatusEnum)
+    with engine.begin() as conn:
+        for chunk in range(0, rows, CHUNK):
+            conn.execute(insert(Todo), [
+                {
+                    "title": sentence(rng, 4),
+                    "description": sentence(rng, 12),
+                    "status": statuses[i % len(statuses)],
+                    "created_at": start + timedelta(seconds=i),
+                    "updated_at": start + timedelta(seconds=i),
+                }
+                for i in range(chunk, min(chunk + CHUNK, rows))
+            ])
+        search_service.rebuild_search_index(conn)
+
+
+def search_page(db, q: str) -> tuple:
+    stmt, rank = search_service.apply_search(
+        select(*TODO_COLUMNS), q, db.bind.dialect.name, search_service.fts_available(db)
+    )
+    total = db.scalar(select(func.count()).select_from(stmt.subquery()))
+    return total, db.execute(stmt.order_by(desc(rank), desc(Todo.id)).limit(LIMIT)).all()
+
+
+def like_page(db, q: str) -> tuple:
+    stmt = select(*TODO_COLUMNS)
+    for term in search_service.search_terms(q):
+        stmt = stmt.where(or_(Todo.title.ilike(f"%{term}%"), Todo.description.ilike(f"%{term}%")))
+    total = db.scalar(select(func.count()).select_from(stmt.subquery()))
+    return total, db.execute(stmt.order_by(desc(Todo.created_at), desc(Todo.id)).limit(LIMIT)).all()
+
+
+def timed(fn) -> float:
+    samples = []
+    for _ in range(REPEAT):
+        began = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - began) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--url", default="sqlite:///bench_search.db")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse the rows of a previous run")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    if not args.skip_seed:
+        began = time.perf_counter()
+        seed(engine, args.rows)
+        print(f"seeded {args.rows} rows in {time.perf_counter() - began:.1f} s")
+
+    print(f"{'query':>10} {'matches':>9} {'search ms':>10} {'like ms':>10} {'speedup':>8}")
+    with sessionmaker(bind=engine)() as db:
+        for name, q in QUERIES.items():
+            matches, _ = search_page(db, q)
+            search_ms = timed(lambda: search_page(db, q))
+            like_ms = timed(lambda: like_page(db, q))
+            print(f"{name:>10} {matches:>9} {search_ms:>10.1f} {like_ms:>10.1f} {like_ms / search_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Cost of building a list page body through ORM instances and response model
+validation (as FastAPI does with response_model) vs plain rows encoded by
+the precompiled serializers used by cache_service
+
+Usage:
+    python -m benchmarks.bench_serialization [--rows 10000] [--limits 20 100] [--url sqlite:///bench.db]
+"""
+import argparse
+import json
+import statistics
+import time
+
+from sqlalchemy import create_engine, desc, select
+from sqlalchemy.orm import sessionmaker
+
+from app.models.todo import Todo
+from app.schemas.todo import TodoListResponse
+from app.services import cache_service
+from app.services.todo_service import TODO_COLUMNS
+from benchmarks.bench_pagination import seed
+
+REPEAT = 200
+
+
+def orm_page(db, limit: int) -> bytes:
+    todos = db.query(Todo).order_by(desc(Todo.created_at), desc(Todo.id)).limit(limit).all()
+    content = {"total": limit, "limit": limit, "offset": 0, "data": todos, "nextCursor": None}
+    # What FastAPI does with response_model=TodoListResponse and a JSONResponse
+    data = TodoListResponse.model_validate(content).model_dump(mode="json", by_alias=True)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def core_page(db, limit: int) -> bytes:
+    stmt = select(*TODO_COLUMNS).order_by(desc(Todo.created_at), desc(Todo.id)).limit(limit)
+    rows = db.execute(stmt).all()
+    return cache_service.encode_page(limit, limit, 0, rows, None).encode()
+
+
+def timed(fn) -> float:
+    samples = []
+    for _ in range(REPEAT):
+        began = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - began) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--limits", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--url", default="sqlite:///bench_serialization.db")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    Session = sessionmaker(bind=engine)
+    seed(engine, args.rows)
+    print(f"{'limit':>6} {'orm ms':>8} {'core ms':>8} {'speedup':>8}")
+    for limit in args.limits:
+        with Session() as db:
+            assert json.loads(orm_page(db, limit)) == json.loads(core_page(db, limit))
+            # Expire between runs so the ORM path pays for building instances
+            orm_ms = timed(lambda: (orm_page(db, limit), db.expunge_all()))
+            core_ms = timed(lambda: core_page(db, limit))
+        print(f"{limit:>6} {orm_ms:>8.3f} {core_ms:>8.3f} {orm_ms / core_ms:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
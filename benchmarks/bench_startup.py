@@ -0,0 +1,79 @@
+"""
+Time from launching uvicorn with N workers until the first request is
+answered and until every worker has completed its startup
+
+The database is migrated once beforehand with run.py. Pass --app-dir to
+measure another checkout of the repository, for example an older revision
+from git worktree.
+
+Usage:
+    python -m benchmarks.bench_startup [--workers 1 4 8] [--url sqlite:///bench_startup.db] [--app-dir .]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+PORT = 8765
+STARTUP_LINE = "Application startup complete"
+TIMEOUT = 120.0
+
+
+def measure(app_dir: str, env: dict, workers: int) -> dict:
+    import httpx
+
+    began = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT),
+         "--workers", str(workers), "--log-level", "info"],
+        cwd=app_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    ready = []
+    all_ready = threading.Event()
+
+    def watch():
+        for line in server.stderr:
+            if STARTUP_LINE in line:
+                ready.append(time.perf_counter() - began)
+                if len(ready) == workers:
+                    all_ready.set()
+
+    threading.Thread(target=watch, daemon=True).start()
+    first = None
+    try:
+        while first is None and time.perf_counter() - began < TIMEOUT:
+            try:
+                if httpx.get(f"http://127.0.0.1:{PORT}/api/v1/todos/stats", timeout=1).status_code == 200:
+                    first = time.perf_counter() - began
+            except httpx.TransportError:
+                time.sleep(0.01)
+        all_ready.wait(max(TIMEOUT - (time.perf_counter() - began), 0))
+    finally:
+        server.terminate()
+        server.wait()
+    return {"first": first, "all": ready[-1] if len(ready) == workers else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--url", default="sqlite:///bench_startup.db")
+    parser.add_argument("--app-dir", default=os.getcwd())
+    args = parser.parse_args()
+
+    app_dir = os.path.abspath(args.app_dir)
+    env = {**os.environ, "DATABASE_URL": args.url, "RATE_LIMIT_ENABLED": "false", "PYTHONPATH": app_dir}
+    subprocess.run([sys.executable, "run.py"], cwd=app_dir, env=env, check=True, capture_output=True)
+
+    print(f"{'workers':>8} {'first request s':>16} {'all workers s':>14}")
+    for workers in args.workers:
+        result = measure(app_dir, env, workers)
+        first = f"{result['first']:.2f}" if result["first"] is not None else "timeout"
+        every = f"{result['all']:.2f}" if result["all"] is not None else "timeout"
+        print(f"{workers:>8} {first:>16} {every:>14}")
+
+
+if __name__ == "__main__":
+    main()
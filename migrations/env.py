@@ -0,0 +1,78 @@
+"""
+Alembic environment of the todos database.
+
+The URL comes from the app settings (DATABASE_URL) unless one is passed with
+alembic -x url=..., and autogenerate compares against the models of
+app.models.todo, apart from the search index which has no model.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.models.todo import Base
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+# Search structures of migration 0003, maintained outside the models
+SEARCH_COLUMNS = {"search_vector"}
+SEARCH_INDEXES = {"ix_todos_search_vector"}
+
+
+def include_name(name, type_, parent_names) -> bool:
+    """Leave the search index out of autogenerate"""
+    if type_ == "table":
+        # todos_fts and the shadow tables FTS5 creates along with it
+        return not name.startswith("todos_fts")
+    if type_ == "column":
+        return name not in SEARCH_COLUMNS
+    if type_ == "index":
+        return name not in SEARCH_INDEXES
+    return True
+
+
+def database_url() -> str:
+    return context.get_x_argument(as_dictionary=True).get("url", settings.DATABASE_URL)
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL without connecting (alembic upgrade --sql)"""
+    context.configure(
+        url=database_url(),
+        target_metadata=target_metadata,
+        include_name=include_name,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=make_url(database_url()).get_backend_name() == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run the migrations on a connection of its own"""
+    connectable = create_engine(database_url(), poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_name=include_name,
+            # SQLite can only alter tables by copying them
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,47 @@
+"""Create the todos table
+
+The schema the app created with metadata.create_all before it had
+migrations. Databases created that way are brought under Alembic with
+alembic stamp 0001 and then upgraded as usual.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Names of the TodoStatusEnum members, which is what the column stores
+STATUSES = ("new", "in_progress", "completed")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "todos",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("status", sa.Enum(*STATUSES, name="todostatusenum"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_todos_id", "todos", ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_todos_id", table_name="todos")
+    op.drop_table("todos")
+    sa.Enum(name="todostatusenum").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,73 @@
+"""Add the keyset pagination indexes and the per-status counters
+
+Also gives created_at a default with sub-second precision on SQLite, where
+CURRENT_TIMESTAMP has none and keyset pagination cannot order by it.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy.dialects import postgresql
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STATUSES = ("new", "in_progress", "completed")
+
+SQLITE_NOW = "(STRFTIME('%Y-%m-%d %H:%M:%f000', 'now'))"
+
+INDEXES = {
+    "ix_todos_status_created_at_id": ["status", "created_at", "id"],
+    "ix_todos_status_updated_at_id": ["status", "updated_at", "id"],
+    "ix_todos_created_at_id": ["created_at", "id"],
+    "ix_todos_updated_at_id": ["updated_at", "id"],
+}
+
+
+def status_type() -> sa.Enum:
+    # The PostgreSQL type already exists, created along with todos
+    if op.get_context().dialect.name == "postgresql":
+        return postgresql.ENUM(*STATUSES, name="todostatusenum", create_type=False)
+    return sa.Enum(*STATUSES, name="todostatusenum")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_context().dialect.name == "sqlite":
+        with op.batch_alter_table("todos") as batch:
+            batch.alter_column("created_at", server_default=sa.text(SQLITE_NOW))
+
+    for name, columns in INDEXES.items():
+        op.create_index(name, "todos", columns)
+
+    counters = op.create_table(
+        "todo_counters",
+        sa.Column("status", status_type(), nullable=False),
+        sa.Column("count", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("status"),
+    )
+    op.bulk_insert(counters, [{"status": status, "count": 0} for status in STATUSES])
+    op.execute(
+        "UPDATE todo_counters SET count = "
+        "(SELECT COUNT(*) FROM todos WHERE todos.status = todo_counters.status)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("todo_counters")
+    for name in INDEXES:
+        op.drop_index(name, table_name="todos")
+
+    if op.get_context().dialect.name == "sqlite":
+        with op.batch_alter_table("todos") as batch:
+            batch.alter_column("created_at", server_default=sa.func.now())
@@ -0,0 +1,54 @@
+"""Add the full-text search index of todo titles and descriptions
+
+PostgreSQL gets a generated tsvector column with a GIN index. SQLite gets
+the FTS5 table todos_fts, keyed by todo id and kept up to date by the todo
+service. Other databases are left as they are and search with LIKE.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 11:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy.dialects import postgresql
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_context().dialect.name
+    if dialect == "postgresql":
+        op.add_column(
+            "todos",
+            sa.Column("search_vector", postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR, persisted=True)),
+        )
+        op.create_index("ix_todos_search_vector", "todos", ["search_vector"], postgresql_using="gin")
+    elif dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE todos_fts USING fts5(title, description, tokenize='porter unicode61')"
+        )
+        op.execute("INSERT INTO todos_fts (rowid, title, description) SELECT id, title, description FROM todos")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_context().dialect.name
+    if dialect == "postgresql":
+        op.drop_index("ix_todos_search_vector", table_name="todos")
+        op.drop_column("todos", "search_vector")
+    elif dialect == "sqlite":
+        op.execute("DROP TABLE todos_fts")
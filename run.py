@@ -1,5 +1,7 @@
-# run.py (for initial testing/migration)
-from app.models.todo import Base
-from app.db.database import engine
+# run.py (apply the database migrations, same as `alembic upgrade head`)
+import os
 
-Base.metadata.create_all(bind=engine)
+from alembic import command
+from alembic.config import Config
+
+command.upgrade(Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")), "head")
@@ -0,0 +1,56 @@
+import asyncio
+import os
+import tempfile
+
+# Settings are read when the app modules are imported. TEST_DATABASE_URL
+# runs the tests against another, empty, database.
+DB_PATH = os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ["DATABASE_ASYNC"] = "true"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+import pytest
+
+from app.db.database import SessionLocal, create_tables
+
+
+@pytest.fixture(scope="session", autouse=True)
+def tables():
+    create_tables()
+
+
+@pytest.fixture
+def db():
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def run_async():
+    """Run a coroutine on a fresh event loop, closing the connections it opened"""
+    from app.db import database
+
+    def run(coroutine):
+        async def scenario():
+            try:
+                return await coroutine
+            finally:
+                # Pooled aiosqlite connections would outlive the loop and
+                # keep the process alive
+                await database.async_engine.dispose()
+
+        return asyncio.run(scenario())
+
+    return run
+
+
+@pytest.fixture(params=["sync", "async"])
+def client(request, monkeypatch):
+    """Test client of the app, with the sync then the async handlers"""
+    from fastapi.testclient import TestClient
+    from app.core.config import settings
+    from app.main import create_app
+
+    monkeypatch.setattr(settings, "DATABASE_ASYNC", request.param == "async")
+    with TestClient(create_app()) as test_client:
+        yield test_client
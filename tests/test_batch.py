@@ -0,0 +1,35 @@
+from collections import Counter
+
+from sqlalchemy.dialects import postgresql
+
+from app.models.todo import TodoStatusEnum
+from app.schemas.todo import TodoCreate
+from app.services import counter_service, todo_service
+
+
+def locked_statuses(deltas):
+    return [
+        statement.compile(dialect=postgresql.dialect()).params["status_1"]
+        for statement in counter_service.delta_statements(deltas)
+    ]
+
+
+def test_counter_rows_are_locked_in_a_fixed_order():
+    forward = Counter({TodoStatusEnum.new: -1, TodoStatusEnum.completed: 1})
+    backward = Counter({TodoStatusEnum.completed: -1, TodoStatusEnum.new: 1})
+    assert locked_statuses(forward) == locked_statuses(backward)
+
+
+def test_batch_status_and_delete_keep_counters_exact(db):
+    before = counter_service.get_counts(db)
+    rows = todo_service.create_todos(db, [TodoCreate(title=f"batch {i}") for i in range(3)])
+    ids = [row.id for row in rows]
+
+    updated = todo_service.update_status_many(db, list(reversed(ids)), TodoStatusEnum.completed)
+    assert sorted(updated) == ids
+    counts = counter_service.get_counts(db)
+    assert counts[TodoStatusEnum.completed] == before[TodoStatusEnum.completed] + 3
+
+    assert sorted(todo_service.delete_todos(db, ids + [10 ** 9])) == ids
+    assert todo_service.delete_todos(db, ids) == []
+    assert counter_service.get_counts(db) == before
@@ -0,0 +1,162 @@
+import threading
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import RedisCache, todo_key
+from app.db.database import AsyncSessionLocal, SessionLocal
+from app.models.todo import TodoStatusEnum
+from app.repositories import todo_repository
+from app.schemas.todo import TodoCreate, TodoUpdate
+from app.services import cache_service, import_service, todo_service
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_cache(server, monkeypatch):
+    backend = RedisCache(
+        fakeredis.FakeRedis(server=server),
+        ttl=30,
+        async_client=fakeredis.aioredis.FakeRedis(server=server),
+    )
+    monkeypatch.setattr(cache_module, "cache", backend)
+    monkeypatch.setattr(cache_service, "cache", backend)
+    return backend
+
+
+def versions(backend):
+    return backend.get_versions(["all", "new", "in-progress", "completed"])
+
+
+def test_hits_and_misses(redis_cache):
+    assert redis_cache.get("a") is None
+    redis_cache.set("a", "1")
+    assert redis_cache.get("a") == "1"
+    assert redis_cache.get("a") == "1"
+    assert redis_cache.snapshot()["hits"] == 2
+    assert redis_cache.snapshot()["misses"] == 1
+
+
+def test_invalidation_drops_only_the_given_todos(redis_cache):
+    redis_cache.set(todo_key(1), "one")
+    redis_cache.set(todo_key(2), "two")
+    redis_cache.invalidate([todo_key(1)], ["new"])
+    assert redis_cache.get(todo_key(1)) is None
+    assert redis_cache.get(todo_key(2)) == "two"
+    assert redis_cache.get_versions(["new", "completed"]) == {"new": 1, "completed": 0}
+
+
+def test_todo_read_before_an_invalidation_is_not_stored(redis_cache):
+    _, stamp = redis_cache.get_stamped(todo_key(1))
+    redis_cache.invalidate([todo_key(1)], [])
+    redis_cache.set_unless_invalidated(todo_key(1), "old", stamp)
+    assert redis_cache.get(todo_key(1)) is None
+
+    _, stamp = redis_cache.get_stamped(todo_key(1))
+    redis_cache.set_unless_invalidated(todo_key(1), "new", stamp)
+    assert redis_cache.get(todo_key(1)) == "new"
+
+
+def test_slow_reader_racing_an_update(redis_cache, db, monkeypatch):
+    todo = todo_service.create_todo(db, TodoCreate(title="old"))
+    selected = threading.Event()
+    updated = threading.Event()
+    get_todo = todo_service.get_todo
+
+    def slow_get_todo(session, todo_id):
+        row = get_todo(session, todo_id)
+        selected.set()
+        updated.wait(5)
+        return row
+
+    monkeypatch.setattr(todo_service, "get_todo", slow_get_todo)
+    reader = threading.Thread(target=cache_service.get_todo, args=(db, todo.id))
+    reader.start()
+    selected.wait(5)
+    monkeypatch.setattr(todo_service, "get_todo", get_todo)
+    with SessionLocal() as writer:
+        todo_service.update_todo(writer, todo.id, TodoUpdate(title="new"))
+    updated.set()
+    reader.join()
+
+    with SessionLocal() as session:
+        assert '"title":"new"' in cache_service.get_todo(session, todo.id)[0]
+
+
+def test_every_mutation_invalidates(redis_cache, db):
+    todo = todo_service.create_todo(db, TodoCreate(title="a"))
+    assert versions(redis_cache) == {"all": 1, "new": 1, "in-progress": 0, "completed": 0}
+
+    def cached_then(mutate, *bumped):
+        cache_service.get_todo(db, todo.id)
+        assert redis_cache.get(todo_key(todo.id)) is not None
+        before = versions(redis_cache)
+        mutate()
+        assert redis_cache.get(todo_key(todo.id)) is None
+        after = versions(redis_cache)
+        assert {name for name in after if after[name] != before[name]} == {"all", *bumped}
+
+    cached_then(lambda: todo_service.update_todo(db, todo.id, TodoUpdate(title="b")), "new")
+    cached_then(lambda: todo_service.update_status(db, todo.id, TodoStatusEnum.completed), "new", "completed")
+    cached_then(
+        lambda: todo_service.update_status_many(db, [todo.id], TodoStatusEnum.in_progress),
+        "completed", "in-progress",
+    )
+    before = versions(redis_cache)
+    todo_service.create_todos(db, [TodoCreate(title="c"), TodoCreate(title="d")])
+    import_service.write_chunk(db, [TodoCreate(title="e")])
+    assert versions(redis_cache)["new"] == before["new"] + 2
+    cached_then(lambda: todo_service.delete_todos(db, [todo.id]), "in-progress")
+
+    other = todo_service.create_todo(db, TodoCreate(title="f"))
+    cache_service.get_todo(db, other.id)
+    todo_service.delete_todo(db, other.id)
+    assert redis_cache.get(todo_key(other.id)) is None
+
+
+def test_async_mutations_invalidate(redis_cache, run_async):
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            todo = await todo_repository.create_todo(db, TodoCreate(title="a"))
+            await todo_repository.create_todos(db, [TodoCreate(title="b")])
+            assert (await redis_cache.get_versions_async(["new"])) == {"new": 2}
+
+            for mutate in [
+                lambda: todo_repository.update_todo(db, todo.id, TodoUpdate(title="c")),
+                lambda: todo_repository.update_status(db, todo.id, TodoStatusEnum.completed),
+                lambda: todo_repository.delete_todo(db, todo.id),
+            ]:
+                assert await cache_service.get_todo_async(db, todo.id) is not None
+                assert await redis_cache.get_async(todo_key(todo.id)) is not None
+                await mutate()
+                assert await redis_cache.get_async(todo_key(todo.id)) is None
+            assert (await redis_cache.get_versions_async(["completed"])) == {"completed": 2}
+
+    run_async(scenario())
+
+
+def test_outage_fails_open(redis_cache, server, db, run_async):
+    todo = todo_service.create_todo(db, TodoCreate(title="a"))
+    server.connected = False
+
+    assert redis_cache.get("a") is None
+    redis_cache.set("a", "1")
+    assert redis_cache.get_versions(["all"]) is None
+    redis_cache.invalidate([todo_key(todo.id)], ["all"])
+    assert '"title":"a"' in cache_service.get_todo(db, todo.id)[0]
+    assert cache_service.get_todos(db, 20, 0) is not None
+    todo_service.update_todo(db, todo.id, TodoUpdate(title="b"))
+
+    async def read():
+        assert await redis_cache.get_async("a") is None
+        async with AsyncSessionLocal() as session:
+            assert '"title":"b"' in (await cache_service.get_todo_async(session, todo.id))[0]
+            assert await cache_service.get_todos_async(session, 20, 0) is not None
+
+    run_async(read())
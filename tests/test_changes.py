@@ -0,0 +1,144 @@
+import asyncio
+import itertools
+import json
+from contextlib import asynccontextmanager
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+
+from app.api.v1.routes import stream_changes
+from app.core import changes
+from app.core.changes import ChangeFeed, RedisChangeFeed
+
+
+def memory_feed(server, buffer_size):
+    return ChangeFeed(buffer_size, 100)
+
+
+def redis_feed(server, buffer_size):
+    return RedisChangeFeed(fakeredis.aioredis.FakeRedis(server=server), buffer_size, 100)
+
+
+# Tells the events of each published() call apart
+batches = itertools.count()
+
+
+@pytest.fixture(params=[memory_feed, redis_feed], ids=["memory", "redis"])
+def make_feed(request):
+    server = fakeredis.FakeServer()
+    return lambda buffer_size=10: request.param(server, buffer_size)
+
+
+@asynccontextmanager
+async def running(feed):
+    await feed.start()
+    try:
+        if isinstance(feed, RedisChangeFeed):
+            # Events published before the listener subscribes are lost
+            for _ in range(100):
+                if (await feed.client.pubsub_numsub(feed.channel))[0][1]:
+                    break
+                await asyncio.sleep(0.01)
+        yield feed
+    finally:
+        await feed.stop()
+
+
+async def published(feed, count):
+    """Publish count events, returning once the feed has received them"""
+    batch = next(batches)
+    for n in range(count):
+        feed.publish(changes.CREATED, changes.event_body(changes.CREATED, n, batch=batch))
+    last = {"type": changes.CREATED, "id": count - 1, "batch": batch}
+    for _ in range(100):
+        if feed.history and json.loads(feed.history[-1].data).items() >= last.items():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("The events were not received")
+
+
+def drain(subscription):
+    events = list(subscription.events)
+    subscription.events.clear()
+    return events
+
+
+def test_resume_replays_the_missed_events(make_feed):
+    async def scenario():
+        async with running(make_feed()) as feed:
+            await published(feed, 2)
+            last_seen = feed.history[-1].seq
+            await published(feed, 3)
+
+            subscription, missed = feed.subscribe(last_seen)
+            assert not missed
+            replayed = drain(subscription)
+            assert [event.seq for event in replayed] == [last_seen + 1, last_seen + 2, last_seen + 3]
+            assert [json.loads(event.data)["id"] for event in replayed] == [0, 1, 2]
+            # Then the live events follow
+            await published(feed, 1)
+            assert [event.seq for event in drain(subscription)] == [last_seen + 4]
+
+    asyncio.run(scenario())
+
+
+def test_resume_beyond_the_buffer_asks_for_a_reload(make_feed):
+    async def scenario():
+        async with running(make_feed(buffer_size=2)) as feed:
+            await published(feed, 1)
+            last_seen = feed.history[-1].seq
+            await published(feed, 3)
+            subscription, missed = feed.subscribe(last_seen)
+            assert missed
+            # What is still buffered is replayed after the reload
+            assert [event.seq for event in drain(subscription)] == [last_seen + 2, last_seen + 3]
+
+    asyncio.run(scenario())
+
+
+def test_redis_feed_reaches_every_worker():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        async with running(redis_feed(server, 10)) as first, running(redis_feed(server, 10)) as second:
+            await published(first, 2)
+            for _ in range(100):
+                if len(second.history) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            assert [event.data for event in second.history] == [event.data for event in first.history]
+
+    asyncio.run(scenario())
+
+
+def test_sse_resumes_after_last_event_id(monkeypatch):
+    async def scenario():
+        feed = ChangeFeed(10, 100)
+        monkeypatch.setattr(changes, "feed", feed)
+        await feed.start()
+        await published(feed, 4)
+        # Last-Event-ID takes precedence over since
+        response = await stream_changes(since=0, last_event_id=2)
+        stream = response.body_iterator
+        try:
+            messages = [await stream.__anext__() for _ in range(2)]
+        finally:
+            await stream.aclose()
+        assert [message.splitlines()[0] for message in messages] == ["id: 3", "id: 4"]
+        assert json.loads(messages[0].splitlines()[2].removeprefix("data: "))["seq"] == 3
+
+    asyncio.run(scenario())
+
+
+def test_websocket_resumes_after_since(client):
+    client.post("/api/v1/todos", json={"title": "seen"})
+    last_seen = changes.feed.history[-1].seq
+    missed = [client.post("/api/v1/todos", json={"title": f"missed {n}"}).json()["id"] for n in range(3)]
+
+    with client.websocket_connect(f"/api/v1/todos/changes?since={last_seen}") as websocket:
+        events = [json.loads(websocket.receive_text()) for _ in missed]
+        assert [event["seq"] for event in events] == [last_seen + 1, last_seen + 2, last_seen + 3]
+        assert [event["id"] for event in events] == missed
+        live = client.post("/api/v1/todos", json={"title": "live"}).json()["id"]
+        event = json.loads(websocket.receive_text())
+        assert (event["seq"], event["id"]) == (last_seen + 4, live)
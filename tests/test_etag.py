@@ -0,0 +1,77 @@
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import MemoryCache
+from app.services import cache_service
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    backend = MemoryCache(100, 30)
+    monkeypatch.setattr(cache_module, "cache", backend)
+    monkeypatch.setattr(cache_service, "cache", backend)
+    return backend
+
+
+@pytest.fixture
+def todo(client):
+    return client.post("/api/v1/todos", json={"title": "tagged"}).json()
+
+
+def test_unchanged_todo_is_not_modified(client, todo):
+    etag = client.get(f"/api/v1/todos/{todo['id']}").headers["ETag"]
+    response = client.get(f"/api/v1/todos/{todo['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    client.patch(f"/api/v1/todos/{todo['id']}", json={"title": "retagged"})
+    response = client.get(f"/api/v1/todos/{todo['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_cached_todo_keeps_its_etag(client, todo, memory_cache):
+    updated = client.patch(f"/api/v1/todos/{todo['id']}", json={"title": "cached"})
+    miss = client.get(f"/api/v1/todos/{todo['id']}")
+    hit = client.get(f"/api/v1/todos/{todo['id']}")
+    assert memory_cache.snapshot()["hits"] == 1
+    assert miss.headers["ETag"] == hit.headers["ETag"] == updated.headers["ETag"]
+    assert miss.json() == hit.json()
+
+
+def test_unchanged_list_is_not_modified(client, todo):
+    etag = client.get("/api/v1/todos").headers["ETag"]
+    response = client.get("/api/v1/todos", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    # Another page has another ETag
+    assert client.get("/api/v1/todos", params={"limit": 1}).headers["ETag"] != etag
+
+    client.post(f"/api/v1/todos/{todo['id']}/complete")
+    response = client.get("/api/v1/todos", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("method, body", [("put", {"title": "late"}), ("patch", {"status": "completed"}), ("delete", None)])
+def test_stale_if_match_fails(client, todo, method, body):
+    stale = client.get(f"/api/v1/todos/{todo['id']}").headers["ETag"]
+    current = client.patch(f"/api/v1/todos/{todo['id']}", json={"description": "first"}).headers["ETag"]
+
+    response = client.request(method, f"/api/v1/todos/{todo['id']}", json=body, headers={"If-Match": stale})
+    assert response.status_code == 412
+    assert client.get(f"/api/v1/todos/{todo['id']}").headers["ETag"] == current
+
+    response = client.request(method, f"/api/v1/todos/{todo['id']}", json=body, headers={"If-Match": current})
+    assert response.status_code < 300
+
+
+@pytest.mark.parametrize("method, body", [("put", {"title": "any"}), ("patch", {"status": "completed"}), ("delete", None)])
+def test_if_match_any(client, todo, method, body):
+    response = client.request(method, f"/api/v1/todos/{todo['id']}", json=body, headers={"If-Match": "*"})
+    assert response.status_code < 300
+    # RFC 9110: * does not match a todo that does not exist
+    response = client.request(method, "/api/v1/todos/0", json=body, headers={"If-Match": "*"})
+    assert response.status_code == 412
+    # Without If-Match a missing todo is a 404
+    assert client.request(method, "/api/v1/todos/0", json=body).status_code == 404
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import func, select
+
+from app.core import cache as cache_module
+from app.core.cache import MemoryCache
+from app.db.database import AsyncSessionLocal, SessionLocal
+from app.models.todo import Todo, TodoStatusEnum
+from app.schemas.todo import TodoCreate
+from app.services import counter_service, group_commit, todo_service
+
+
+class FlakyCache(MemoryCache):
+    """Cache whose first invalidation fails, as during a Redis blip"""
+
+    def __init__(self):
+        super().__init__(100, 30)
+        self.failures = 1
+
+    def invalidate(self, keys, versions):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("cache unavailable")
+        super().invalidate(keys, versions)
+
+
+@pytest.fixture
+def flaky_cache(monkeypatch):
+    monkeypatch.setattr(cache_module, "cache", FlakyCache())
+
+
+def snapshot(db):
+    return db.scalar(select(func.count()).select_from(Todo)), counter_service.get_counts(db)[TodoStatusEnum.new]
+
+
+def create_concurrently(create, titles):
+    rows = {}
+
+    def run(title):
+        rows[title] = create(title)
+
+    threads = [threading.Thread(target=run, args=(title,)) for title in titles]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return rows
+
+
+def check_written_once(db, before, rows, titles):
+    assert {title: row.title for title, row in rows.items()} == {title: title for title in titles}
+    assert len({row.id for row in rows.values()}) == len(titles)
+    count, new = snapshot(db)
+    assert (count, new) == (before[0] + len(titles), before[1] + len(titles))
+
+
+def test_failed_hooks_do_not_write_the_batch_again(db, flaky_cache):
+    batcher = group_commit.CreateBatcher(max_size=3, window=5)
+    titles = ["sync a", "sync b", "sync c"]
+    before = snapshot(db)
+
+    def create(title):
+        with SessionLocal() as session:
+            return batcher.create(session, TodoCreate(title=title))
+
+    check_written_once(db, before, create_concurrently(create, titles), titles)
+
+
+def test_failed_hooks_do_not_write_the_async_batch_again(db, flaky_cache, run_async):
+    batcher = group_commit.AsyncCreateBatcher(AsyncSessionLocal, max_size=3, window=5)
+    titles = ["async a", "async b", "async c"]
+    before = snapshot(db)
+
+    async def create_all():
+        rows = await asyncio.gather(*(batcher.create(TodoCreate(title=title)) for title in titles))
+        return dict(zip(titles, rows))
+
+    check_written_once(db, before, run_async(create_all()), titles)
+
+
+def test_failing_todo_is_isolated(db, monkeypatch):
+    batcher = group_commit.CreateBatcher(max_size=3, window=5)
+    insert_todo = todo_service.insert_todo
+
+    def insert_many(session, items):
+        raise ValueError("batch")
+
+    def insert_one(session, item):
+        if item.title == "bad":
+            raise ValueError("bad todo")
+        return insert_todo(session, item)
+
+    monkeypatch.setattr(todo_service, "insert_todos", insert_many)
+    monkeypatch.setattr(todo_service, "insert_todo", insert_one)
+    before = snapshot(db)
+
+    def create(title):
+        with SessionLocal() as session:
+            try:
+                return batcher.create(session, TodoCreate(title=title))
+            except ValueError as e:
+                return e
+
+    rows = create_concurrently(create, ["good 1", "bad", "good 2"])
+    assert isinstance(rows.pop("bad"), ValueError)
+    check_written_once(db, before, rows, ["good 1", "good 2"])
@@ -0,0 +1,30 @@
+import csv
+import io
+
+from sqlalchemy import select
+
+from app.db.database import SessionLocal
+from app.models.todo import Todo
+from app.schemas.todo import TodoCreate
+from app.services import import_service, todo_service
+
+
+def test_copy_rows_tell_null_from_empty():
+    row = import_service.copy_row(["say \"hi\"", None, "", "a,b\nc"])
+    assert row == '"say ""hi""",,"","a,b\nc"\n'
+    # Quoting aside, the values read back as written
+    assert next(csv.reader(io.StringIO(row))) == ['say "hi"', "", "", "a,b\nc"]
+
+
+def test_empty_description_is_kept(db):
+    import_service.write_chunk(db, [TodoCreate(title="x", description=""), TodoCreate(title="y")])
+    rows = todo_service.get_todos(db, 2, 0)[1]
+    assert {row.title: row.description for row in rows} == {"x": "", "y": None}
+
+
+def test_csv_empty_description_is_kept(db):
+    body = b"title,description\ncsv empty,\ncsv none\ncsv text,some text\n"
+    assert import_service.import_todos(SessionLocal, "csv", [body])["imported"] == 3
+    rows = db.execute(select(Todo.title, Todo.description).where(Todo.title.like("csv %"))).all()
+    # The same as {"description": ""} and a missing description in NDJSON
+    assert dict(rows) == {"csv empty": "", "csv none": None, "csv text": "some text"}
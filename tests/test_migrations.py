@@ -0,0 +1,15 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_run_upgrades_from_another_directory(tmp_path):
+    path = tmp_path / "todos.db"
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}")
+    subprocess.run([sys.executable, os.path.join(ROOT, "run.py")], cwd=tmp_path, env=env, check=True)
+    with sqlite3.connect(path) as connection:
+        tables = {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert {"todos", "todo_counters", "alembic_version"} <= tables
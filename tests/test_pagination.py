@@ -0,0 +1,67 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+from app.models.todo import Todo
+from app.schemas.todo import TodoCreate
+from app.services import todo_service
+
+
+@pytest.fixture
+def tied(db):
+    """Todos sharing one created_at, so only the id orders them"""
+    rows = todo_service.create_todos(db, [TodoCreate(title=f"tied {i}") for i in range(5)])
+    ids = [row.id for row in rows]
+    db.execute(update(Todo).where(Todo.id.in_(ids)).values(created_at=datetime(2020, 1, 1)))
+    db.commit()
+    return ids
+
+
+def pages(client, **params):
+    params = {"limit": 2, **params}
+    seen = []
+    while True:
+        page = client.get("/api/v1/todos", params=params).json()
+        seen += [todo["id"] for todo in page["data"]]
+        if not page["nextCursor"]:
+            return seen
+        params["cursor"] = page["nextCursor"]
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_cursor_walks_every_todo_once(client, db, tied, order):
+    seen = pages(client, order=order)
+    rows = db.query(Todo.created_at, Todo.id).all()
+    assert seen == [todo_id for _, todo_id in sorted(rows, reverse=order == "desc")]
+    # The tied todos come out by id, next to each other
+    start = seen.index(min(tied) if order == "asc" else max(tied))
+    assert seen[start:start + len(tied)] == sorted(tied, reverse=order == "desc")
+
+
+def test_cursor_takes_precedence_over_offset(client, tied):
+    cursor = client.get("/api/v1/todos", params={"limit": 2}).json()["nextCursor"]
+    page = client.get("/api/v1/todos", params={"limit": 2, "cursor": cursor}).json()
+    assert client.get("/api/v1/todos", params={"limit": 2, "cursor": cursor, "offset": 3}).json() == page
+
+
+def tamper(cursor, **changes):
+    payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    return base64.urlsafe_b64encode(json.dumps({**payload, **changes}).encode()).decode()
+
+
+def test_invalid_cursors_are_rejected(client, tied):
+    cursor = client.get("/api/v1/todos", params={"limit": 2}).json()["nextCursor"]
+    for bad in ["garbage", cursor[:-4], tamper(cursor, v="yesterday"), tamper(cursor, id=None), tamper(cursor, s="updatedAt")]:
+        assert client.get("/api/v1/todos", params={"cursor": bad}).status_code == 400, bad
+    # A cursor only continues the sort it was issued for
+    assert client.get("/api/v1/todos", params={"cursor": cursor, "order": "asc"}).status_code == 400
+    assert client.get("/api/v1/todos", params={"cursor": cursor, "sortBy": "updatedAt"}).status_code == 400
+
+
+def test_cursor_is_rejected_with_relevance(client, tied):
+    cursor = client.get("/api/v1/todos", params={"limit": 2}).json()["nextCursor"]
+    response = client.get("/api/v1/todos", params={"q": "tied", "sortBy": "relevance", "cursor": cursor})
+    assert response.status_code == 400
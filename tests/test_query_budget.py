@@ -0,0 +1,70 @@
+"""
+SQL statements sent by each endpoint, as reported by X-SQL-Statements on
+SQLite (COMMIT not counted). A change that sends more statements has to
+raise the budget here on purpose.
+"""
+import pytest
+
+from app.core.config import settings
+
+# (method, path, JSON body, statements); {id} is an existing todo
+BUDGETS = {
+    "create": ("POST", "/todos", {"title": "budget"}, 3),
+    "list": ("GET", "/todos", None, 3),
+    "list by status": ("GET", "/todos?status=new", None, 3),
+    "list next page": ("GET", "/todos?limit=1", None, 3),
+    "search": ("GET", "/todos?q=budget", None, 3),
+    "stats": ("GET", "/todos/stats", None, 1),
+    "get": ("GET", "/todos/{id}", None, 1),
+    "get missing": ("GET", "/todos/0", None, 1),
+    "put": ("PUT", "/todos/{id}", {"title": "budget put"}, 4),
+    "patch": ("PATCH", "/todos/{id}", {"description": "budget patch"}, 4),
+    "patch status": ("PATCH", "/todos/{id}", {"status": "in-progress"}, 2),
+    "complete": ("POST", "/todos/{id}/complete", None, 2),
+    "in progress": ("POST", "/todos/{id}/in-progress", None, 2),
+    "delete": ("DELETE", "/todos/{id}", None, 3),
+    "delete missing": ("DELETE", "/todos/0", None, 1),
+    "batch create": ("POST", "/todos:batch", {"items": [{"title": "a"}, {"title": "b"}]}, 4),
+    "batch status": ("PATCH", "/todos:batch-status", {"ids": ["{id}", 0], "status": "completed"}, 4),
+    "batch delete": ("DELETE", "/todos:batch", {"ids": ["{id}", 0]}, 4),
+}
+
+
+@pytest.fixture(autouse=True)
+def count_header(monkeypatch):
+    if not settings.DATABASE_URL.startswith("sqlite"):
+        pytest.skip("The budgets are those of SQLite")
+    # Set before the client fixture builds the app
+    monkeypatch.setattr(settings, "SQL_COUNT_HEADER", True)
+
+
+def statements(client, method, path, body=None, **kwargs):
+    response = client.request(method, f"/api/v1{path}", json=body, **kwargs)
+    assert response.status_code < 500
+    return int(response.headers["X-SQL-Statements"])
+
+
+@pytest.fixture
+def todo_id(client):
+    # Once per engine the search index is looked up, outside the budgets
+    client.post("/api/v1/todos/import", content='{"title": "warm up"}')
+    return client.post("/api/v1/todos", json={"title": "budget todo"}).json()["id"]
+
+
+@pytest.mark.parametrize("endpoint", BUDGETS)
+def test_query_budget(client, todo_id, endpoint):
+    method, path, body, budget = BUDGETS[endpoint]
+    if body and "ids" in body:
+        body = {**body, "ids": [todo_id if i == "{id}" else i for i in body["ids"]]}
+    assert statements(client, method, path.format(id=todo_id), body) == budget
+
+
+def test_import_budget(client, todo_id):
+    lines = "\n".join('{"title": "imported"}' for _ in range(3))
+    assert statements(client, "POST", "/todos/import", content=lines) == 3
+
+
+def test_stale_if_match_budget(client, todo_id):
+    etag = client.get(f"/api/v1/todos/{todo_id}").headers["ETag"]
+    client.patch(f"/api/v1/todos/{todo_id}", json={"title": "changed"})
+    assert statements(client, "PATCH", f"/todos/{todo_id}", {"title": "late"}, headers={"If-Match": etag}) == 2
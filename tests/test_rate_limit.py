@@ -0,0 +1,25 @@
+from app.core.rate_limit import client_key, parse_networks
+
+PROXIES = parse_networks(["10.0.0.0/8", "192.168.1.1"])
+
+
+def scope(peer, *forwarded):
+    return {
+        "client": (peer, 1234),
+        "headers": [(b"x-forwarded-for", value.encode()) for value in forwarded],
+    }
+
+
+def test_direct_clients_are_keyed_by_address():
+    assert client_key(scope("203.0.113.5")) == "203.0.113.5"
+    # Only trusted proxies may forward an address
+    assert client_key(scope("203.0.113.5", "198.51.100.1"), PROXIES) == "203.0.113.5"
+
+
+def test_clients_behind_trusted_proxies():
+    assert client_key(scope("10.1.2.3", "198.51.100.1"), PROXIES) == "198.51.100.1"
+    # Addresses added by the client are skipped, as are inner proxies
+    assert client_key(scope("10.1.2.3", "1.1.1.1, 198.51.100.1, 192.168.1.1"), PROXIES) == "198.51.100.1"
+    assert client_key(scope("10.1.2.3", "1.1.1.1", "198.51.100.1"), PROXIES) == "198.51.100.1"
+    # Without the header the proxy itself is the client
+    assert client_key(scope("10.1.2.3"), PROXIES) == "10.1.2.3"
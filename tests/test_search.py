@@ -0,0 +1,87 @@
+import uuid
+
+import pytest
+from sqlalchemy import select, text
+
+from app.models.todo import Todo
+from app.services import search_service
+
+
+@pytest.fixture
+def word():
+    """Word no other todo contains"""
+    return "w" + uuid.uuid4().hex[:10]
+
+
+def search(client, q, **params):
+    response = client.get("/api/v1/todos", params={"q": q, **params})
+    assert response.status_code in (200, 204)
+    return [todo["id"] for todo in response.json()["data"]] if response.status_code == 200 else []
+
+
+def create(client, title, description=None):
+    return client.post("/api/v1/todos", json={"title": title, "description": description}).json()["id"]
+
+
+def test_search_matches_title_and_description(client, word):
+    in_title = create(client, f"buy {word}", "at the market")
+    in_description = create(client, "errands", f"buy {word} too")
+    create(client, "buy bread", "at the market")
+    assert sorted(search(client, word)) == sorted([in_title, in_description])
+    # Every word of the query must match
+    assert search(client, f"{word} market") == [in_title]
+    assert search(client, f"{word} nowhere") == []
+
+
+def test_search_ranks_title_matches_first(client, word):
+    in_description = create(client, "errands", f"call about {word}")
+    in_title = create(client, f"call about {word}", "errands")
+    assert search(client, word) == [in_title, in_description]
+    assert search(client, word, sortBy="relevance", order="asc") == [in_description, in_title]
+    # Searches can still be sorted by date
+    assert search(client, word, sortBy="createdAt", order="asc") == [in_description, in_title]
+
+
+def test_search_with_status(client, word):
+    done = create(client, f"{word} done")
+    create(client, f"{word} open")
+    client.post(f"/api/v1/todos/{done}/complete")
+    response = client.get("/api/v1/todos", params={"q": word, "status": "completed"}).json()
+    assert [todo["id"] for todo in response["data"]] == [done]
+    assert response["total"] == 1
+
+
+def indexed(db, ids):
+    """Text the search index holds for the given todos, by id"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        rows = db.execute(select(search_service.todos_fts).where(search_service.todos_fts.c.rowid.in_(ids)))
+        return {row.rowid: (row.title, row.description) for row in rows}
+    if dialect == "postgresql":
+        # The generated column must equal its expression over the current columns
+        rows = db.execute(text(
+            f"SELECT id, search_vector = {search_service.SEARCH_VECTOR_EXPRESSION} AS fresh "
+            "FROM todos WHERE id = ANY(:ids)"
+        ), {"ids": list(ids)})
+        return {row.id: row.fresh for row in rows}
+    pytest.skip(f"No search index on {dialect}")
+
+
+def test_search_index_follows_updates_and_deletes(client, db, word):
+    kept = create(client, f"{word} draft", "first")
+    deleted = create(client, f"{word} spare")
+    client.put(f"/api/v1/todos/{kept}", json={"title": "final", "description": f"{word} second"})
+    client.patch(f"/api/v1/todos/{kept}", json={"status": "in-progress"})
+    client.delete(f"/api/v1/todos/{deleted}")
+
+    assert search(client, word) == [kept]
+    assert kept not in search(client, "draft")
+    assert kept in search(client, f"final {word}")
+
+    index = indexed(db, [kept, deleted])
+    assert deleted not in index
+    todo = db.get(Todo, kept)
+    if db.get_bind().dialect.name == "sqlite":
+        assert index[kept] == (todo.title, todo.description)
+    else:
+        assert index[kept] is True
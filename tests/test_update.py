@@ -0,0 +1,21 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.models.todo import Todo
+from app.services import counter_service
+
+
+def table_counts(db):
+    counts = dict(db.execute(select(Todo.status, func.count()).group_by(Todo.status)).all())
+    return {status: counts.get(status, 0) for status in counter_service.get_counts(db)}
+
+
+@pytest.mark.parametrize("method", ["put", "patch"])
+def test_null_status_is_rejected(client, db, method):
+    todo = client.post("/api/v1/todos", json={"title": "keep my status"}).json()
+    client.patch(f"/api/v1/todos/{todo['id']}", json={"status": "in-progress"})
+
+    response = client.request(method, f"/api/v1/todos/{todo['id']}", json={"title": "x", "status": None})
+    assert response.status_code == 422
+    assert client.get(f"/api/v1/todos/{todo['id']}").json()["status"] == "in-progress"
+    assert counter_service.get_counts(db) == table_counts(db)